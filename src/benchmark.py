@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import random
+import sys
+import timeit
+
+from typing import Callable
+
+from grid import (
+    GRID_ORTHOGONAL,
+    PACKED_ORTHOGONAL,
+    Grid,
+    GridOrthogonalDistance,
+)
+from search import AstarSearch
+
+
+def measure(label: str, function: Callable, repeat: int = 5) -> float:
+    """Print and return the best of several timings of function, in milliseconds"""
+    elapsed = min(timeit.repeat(function, number=1, repeat=repeat)) * 1_000
+    print(f'{elapsed:10,.3f} ms: {label}')
+    return elapsed
+
+
+def random_lines(rows: int, cols: int, symbols: str = '.#O', seed: int = 2023) -> list[str]:
+    rng = random.Random(seed)
+    return [''.join(rng.choices(symbols, k=cols)) for _ in range(rows)]
+
+
+def parse_cells(grid: Grid, lines: list[str], conversion: Callable = None) -> None:
+    """The original Grid._parse: convert and insert one cell at a time"""
+    for row, line in enumerate(lines):
+        for col, value in enumerate(line):
+            r, c = row + grid._offset, col + grid._offset
+            if grid._origin == 'll':
+                r = grid._rows - 1 + 2 * grid._offset - r
+            if conversion:
+                value = conversion(value)
+            if not (grid._sparse and value is None):
+                grid._grid[grid.position(r, c)] = value
+
+
+def bench_copies(size: int = 1_000) -> None:
+    """Copy-on-write snapshots: taking a copy, and the first write to it"""
+    lines = random_lines(size, size)
+
+    for storage in ['dict', 'dense', 'tiled']:
+        grid = Grid(lines, storage=storage)
+        position = grid.position(size // 2, size // 2)
+
+        def write():
+            Grid(grid)[position] = 'X'
+
+        measure(f'{storage:5} copy', lambda: Grid(grid))
+        measure(f'{storage:5} copy + write', write)
+
+
+def bench_gridfile(size: int = 3_000) -> None:
+    """Reloading a saved grid file vs parsing the text again"""
+    import os
+    import tempfile
+
+    from gridfile import load_grid, save_grid
+
+    lines = random_lines(size, size)
+    grid = Grid(lines, storage='dense')
+    path = os.path.join(tempfile.mkdtemp(), 'bench.grid')
+
+    measure('parse', lambda: Grid(lines, storage='dense'), repeat=3)
+    measure('save', lambda: save_grid(grid, path), repeat=3)
+    measure('load', lambda: load_grid(path))
+    measure('load + copy + write', lambda: Grid(load_grid(path)).__setitem__(grid.position(0, 0), 'X'))
+    os.remove(path)
+
+
+def bench_parse(size: int = 1_000) -> None:
+    """Per-cell vs line-at-a-time parsing, on a scaled-up Day14 style grid"""
+    lines = random_lines(size, size)
+
+    for storage in ['dict', 'dense']:
+        for keywords in [{}, {'origin': 'll', 'offset': 1}, {'conversion': ord}]:
+            label = ' '.join(f'{k}={v.__name__ if callable(v) else v}' for k, v in keywords.items())
+            options = {k: v for k, v in keywords.items() if k != 'conversion'}
+            measure(f'{storage:5} per cell  {label}',
+                    lambda: parse_cells(Grid(rows=size, cols=size, storage=storage, **options),
+                                        lines, keywords.get('conversion')), repeat=3)
+            measure(f'{storage:5} per line  {label}',
+                    lambda: Grid(lines, storage=storage, **keywords), repeat=3)
+
+
+def bench_border(size: int = 140) -> None:
+    """Probing neighbors with inbounds checks vs reading a sentinel border"""
+    lines = random_lines(size, size)
+    plain = Grid(lines)
+    bordered = Grid(lines, border=1, border_value='X')
+    cells = list(plain.keys())
+
+    def checked():
+        for position in cells:
+            for direction in GRID_ORTHOGONAL:
+                neighbor = position + direction
+                if plain.inbounds(neighbor):
+                    plain[neighbor]
+
+    def sentinel():
+        for position in cells:
+            for direction in GRID_ORTHOGONAL:
+                if bordered[position + direction] != 'X':
+                    pass
+
+    measure('inbounds', checked)
+    measure('border', sentinel)
+
+
+def bench_components(size: int = 1_000) -> None:
+    """Labeling the regions of a random million-cell grid"""
+    grid = Grid(random_lines(size, size, '.#'))
+
+    measure('components', lambda: grid.components(), repeat=3)
+    measure('components (8-way)', lambda: grid.components(diagonal=True), repeat=3)
+
+
+def heapq_traverse(search: AstarSearch, origin, target) -> list:
+    """The original AstarSearch.traverse: heapq, with a linear membership scan"""
+    from heapq import heappop, heappush
+
+    search._clear()
+    a_origin, a_target = search._find(origin), search._find(target)
+    exploring = [a_origin]
+    g_score = {a_origin: 0}
+    while exploring:
+        current = heappop(exploring)
+        if current == a_target:
+            return search._reconstruct_path(current)
+        for node in search.neighbors(current.node):
+            neighbor = search._find(node)
+            tentative = g_score[current] + search.distance(current.node, neighbor.node)
+            if tentative < g_score.get(neighbor, search.UNSEEN):
+                neighbor.backtrack = current
+                g_score[neighbor] = tentative
+                neighbor.priority = tentative + search.heuristic(neighbor.node)
+                if neighbor not in exploring:
+                    heappush(exploring, neighbor)
+    return None
+
+
+def bench_search(size: int = 141) -> None:
+    """A* with heapq and a linear membership scan vs an IndexedHeap, on Day17 sized grids"""
+
+    class Weighted(Grid, AstarSearch):
+        def neighbors(self, node):
+            return [n for n in (node + d for d in PACKED_ORTHOGONAL) if self[n] is not None]
+
+        def distance(self, src, dst):
+            return self[dst]
+
+        def heuristic(self, node):
+            return GridOrthogonalDistance(node, self.target)
+
+    for n in [size, 2 * size]:
+        grid = Weighted(random_lines(n, n, '123456789'), conversion=int, positions='packed', border=1)
+        grid.target = grid.position(n - 1, n - 1)
+        origin = grid.position(0, 0)
+
+        measure(f'{n}x{n} heapq', lambda: heapq_traverse(grid, origin, grid.target), repeat=1)
+        measure(f'{n}x{n} indexed heap', lambda: grid.traverse(origin, grid.target), repeat=3)
+
+
+def bench_render(size: int = 2_000) -> None:
+    """Drawing a grid per cell vs streaming it with `Grid.write`"""
+    import io
+
+    lines = random_lines(size, size)
+
+    for storage in ['dict', 'dense']:
+        grid = Grid(lines, storage=storage)
+
+        def per_cell():
+            return '\n'.join(''.join([grid.render(v) for v in grid.row(r)]) for r in grid.row_range)
+
+        measure(f'{storage:5} per cell', per_cell, repeat=3)
+        measure(f'{storage:5} write', lambda: grid.write(io.StringIO()), repeat=3)
+        measure(f'{storage:5} write (binary)', lambda: grid.write(io.BytesIO()), repeat=3)
+
+
+def bench_positions(size: int = 140) -> None:
+    """Complex vs packed int positions, on a 140x140 grid like Day10/Day16/Day17"""
+    lines = random_lines(size, size)
+
+    for positions, directions in [('complex', GRID_ORTHOGONAL), ('packed', PACKED_ORTHOGONAL)]:
+        grid = Grid(lines, positions=positions)
+        cells = list(grid.keys())
+        target = grid.position(size-1, size-1)
+        row, col = grid.position_row, grid.position_col
+
+        def neighbors():
+            for position in cells:
+                for direction in directions:
+                    neighbor = position + direction
+                    if grid.inbounds(neighbor):
+                        grid[neighbor]
+
+        def split():
+            for position in cells:
+                row(position), col(position)
+
+        def distance():
+            for position in cells:
+                GridOrthogonalDistance(position, target)
+
+        def hashing():
+            return set(cells)
+
+        measure(f'{positions:7} neighbors', neighbors)
+        measure(f'{positions:7} row/col', split)
+        measure(f'{positions:7} distance', distance)
+        measure(f'{positions:7} hash', hashing)
+
+
+BENCHMARKS: dict[str, Callable] = {
+    'border': bench_border,
+    'components': bench_components,
+    'copies': bench_copies,
+    'gridfile': bench_gridfile,
+    'parse': bench_parse,
+    'positions': bench_positions,
+    'render': bench_render,
+    'search': bench_search,
+}
+
+if __name__ == '__main__':
+    for name in sys.argv[1:] or BENCHMARKS:
+        print(f'===== Benchmark: {name} =====')
+        BENCHMARKS[name]()
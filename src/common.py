@@ -1,26 +1,65 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from functools import cache, cached_property
-
-from grid import (
-    Grid,
-    GridCol,
-    GridDirection,
-    GridOrthogonalDistance,
-    GridPosition,
-    GridRow,
-)
-from runner import (
-    IGNORE,
-    Data,
-    Puzzle,
-    PuzzleResult,
-)
-from search import (
-    AstarNode,
-    AstarSearch,
-)
+# Exported names are resolved on first use, so a puzzle only pays for
+# importing the modules it actually touches. `from common import *` resolves
+# only the original names in __all__; import the others explicitly, e.g.
+# `from common import BitGrid`.
+_EXPORTS = {
+    'dataclass': 'dataclasses',
+    'field': 'dataclasses',
+    'cache': 'functools',
+    'cached_property': 'functools',
+    'Adjacency': 'grid',
+    'BitGrid': 'grid',
+    'BitLayer': 'grid',
+    'Components': 'grid',
+    'CompressedGrid': 'grid',
+    'Grid': 'grid',
+    'GridCol': 'grid',
+    'GridDirection': 'grid',
+    'GridOrthogonalDistance': 'grid',
+    'GridPosition': 'grid',
+    'GridRow': 'grid',
+    'GRID_ORTHOGONAL': 'grid',
+    'Layer': 'grid',
+    'PackedCol': 'grid',
+    'PackedDirection': 'grid',
+    'PackedPosition': 'grid',
+    'PackedRow': 'grid',
+    'PACKED_ORTHOGONAL': 'grid',
+    'IGNORE': 'runner',
+    'Data': 'runner',
+    'Puzzle': 'runner',
+    'PuzzleResult': 'runner',
+    'counter': 'metrics',
+    'gauge': 'metrics',
+    'AstarNode': 'search',
+    'AstarSearch': 'search',
+    'IndexedHeap': 'search',
+    'StateSearch': 'search',
+    'load_grid': 'gridfile',
+    'save_grid': 'gridfile',
+}
+
+__all__ = [
+    'dataclass', 'field', 'cache', 'cached_property',
+    'Grid', 'GridCol', 'GridDirection', 'GridOrthogonalDistance', 'GridPosition', 'GridRow',
+    'IGNORE', 'Data', 'Puzzle', 'PuzzleResult',
+    'AstarNode', 'AstarSearch',
+]
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    module = __import__(_EXPORTS[name])
+    value = globals()[name] = getattr(module, name)
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
+
 
 if __name__ == '__main__':
     print('You meant to run a Puzzle!')
@@ -4,7 +4,7 @@ import math
 import re
 from functools import reduce
 
-from common import *
+from common import Puzzle, dataclass
 
 
 @dataclass
@@ -3,6 +3,7 @@ from __future__ import annotations
 import os
 
 from common import *
+from common import BitGrid
 
 
 class Direction:
@@ -72,6 +73,7 @@ class PipeMaze:
 
         self.start: GridPosition
         self.loop: list[GridPosition]
+        self.members = BitGrid(range(self.rows), range(self.cols))
 
         self.find_start()
         self.find_loop()
@@ -123,11 +125,13 @@ class PipeMaze:
 
     def find_loop(self) -> None:
         self.loop = [self.start]
+        self.members.add(self.start)
 
         direction = Pipe.PIPES[self[self.start]].directions[0]
         neighbor = self.start + direction.delta
-        while neighbor not in self.loop:
+        while neighbor not in self.members:
             self.loop.append(neighbor)
+            self.members.add(neighbor)
             if self.path:
                 self.path[int(neighbor.real)][int(neighbor.col)
                                               ] = Pipe.PIPES[self[neighbor]].symbol
@@ -148,15 +152,15 @@ class PipeMaze:
 
         for row in range(self.rows):
             interior = False
+            members = self.members.row(row)
             for col, symbol in enumerate(self.grid[row]):
-                pos = GridPosition(row, col)
-                if pos in self.loop:
+                if members >> col & 1:
                     if symbol in Pipe.INSIDE:
                         interior = not interior
                 elif interior:
                     inside += 1
                     if self.path:
-                        self.path[int(pos.real)][int(pos.imag)] = ord('I')
+                        self.path[row][col] = ord('I')
 
         return inside
 
@@ -5,14 +5,23 @@ from typing import Generator
 
 from common import *
 
+try:
+    import numpy
+    STORAGE = 'numpy'
+except ImportError:
+    STORAGE = 'dict'
+
 
 class Reflections:
 
     def __init__(self, lines: list[str]):
         self.lines: list[str] = lines
 
-        self.horizontal: Grid = Grid(lines)
-        self.vertical: Grid = Grid(lines, transpose=True)
+        self.horizontal: Grid = Grid(lines, storage=STORAGE)
+        if STORAGE == 'numpy':
+            self.vertical: Grid = self.horizontal.transposed()  # A view: codes are a transposed ndarray
+        else:
+            self.vertical: Grid = Grid(lines, transpose=True)  # Its own cells, for fast row reads
 
     def __repr__(self) -> str:
         return f'Grid({self.horizontal._rows}x{self.horizontal._cols})'
@@ -40,6 +49,9 @@ class Reflections:
             yield (left, right)
 
     def reflection(self, grid, margin=0) -> int:
+        if STORAGE == 'numpy':
+            return self.reflection_array(grid, margin)
+
         errors = Counter()
 
         for left_set, right_set in self.mirror_rows(grid):
@@ -58,6 +70,14 @@ class Reflections:
 
         return matches[0] if len(matches) else 0
 
+    def reflection_array(self, grid, margin=0) -> int:
+        codes = grid.codes
+        for left_set, right_set in self.mirror_rows(grid):
+            errors = numpy.count_nonzero(codes[list(left_set)] != codes[list(right_set)])
+            if errors == margin:
+                return left_set.stop
+        return 0
+
     def measure(self, margin: int) -> int:
         reflect = self.reflection(self.horizontal, margin) * 100
         reflect = reflect if reflect else self.reflection(
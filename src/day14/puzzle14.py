@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+from typing import Optional
+
 from common import *
+from common import counter
 
 NORTH = GridDirection(1, 0)
 SOUTH = GridDirection(-1, 0)
@@ -11,43 +14,54 @@ DOT = '.'
 FIXED = '#'
 ROUNDED = 'O'
 
+SLIDES = counter('slides')
+
 
 class Platform(Grid):
 
     def __init__(self, lines):
         super().__init__(lines, origin='ll', offset=1, sparse=True)
 
-    def slide(self, position: GridPosition, direction: GridDirection) -> None:
-        if self[position] == ROUNDED:
-            next = position + direction
-            while self.inbounds(next) and self[next] == DOT:
-                self[next] = self[position]
-                self[position] = DOT
-                position, next = next, next + direction
+        # Views in which each direction is "up" (towards higher row numbers)
+        self.views: dict[GridDirection, Grid] = {
+            NORTH: self,
+            SOUTH: self.flipped('rows'),
+            EAST: self.transposed(),
+            WEST: self.rotated(3),
+        }
+        self.north_load: Optional[int] = None  # As of the last checkpoint
 
     def tilt(self, direction: GridDirection) -> None:
-        if direction == NORTH:  # Rows 9-1, all columns
-            for row in reversed(self.row_range[:-1]):
-                for col in self.col_range:
-                    self.slide(GridPosition(row, col), direction)
-        elif direction == SOUTH:  # Rows 2-10, all columns
-            for row in self.row_range[1:]:
-                for col in self.col_range:
-                    self.slide(GridPosition(row, col), direction)
-        elif direction == EAST:  # Cols 9-1, all rows
-            for col in reversed(self.col_range[:-1]):
-                for row in self.row_range:
-                    self.slide(GridPosition(row, col), direction)
-        elif direction == WEST:  # Cols 2-10, all rows
-            for col in self.col_range[1:]:
-                for row in self.row_range:
-                    self.slide(GridPosition(row, col), direction)
+        view = self.views[direction]
+        top = view.row_range.stop - 1
+        for col in view.col_range:
+            free = top  # Where the next rounded rock will come to rest
+            for row in reversed(view.row_range):
+                position = GridPosition(row, col)
+                cell = view[position]
+                if cell == FIXED:
+                    free = row - 1
+                elif cell == ROUNDED:
+                    if row != free:
+                        SLIDES.add()
+                        view[GridPosition(free, col)] = ROUNDED
+                        view[position] = DOT
+                    free -= 1
 
     def spin(self, cycles: int) -> None:
-        history = []
-        for i in range(1, cycles+1):
+        seen: dict[int, int] = {}  # fingerprint: cycle
+        cycle = 0
+        while cycle < cycles:
             for direction in [NORTH, WEST, SOUTH, EAST]:
                 self.tilt(direction)
+            cycle += 1
+
+            if self.fingerprint in seen:
+                period = cycle - seen[self.fingerprint]
+                cycle += (cycles - cycle) // period * period
+                seen.clear()
+            else:
+                seen[self.fingerprint] = cycle
 
     def load_score(self, orientation: GridDirection, position: GridPosition) -> int:
         if orientation == NORTH:
@@ -61,10 +75,24 @@ class Platform(Grid):
         return 0
 
     def load(self, orientation: GridDirection) -> int:
-        return sum([self.load_score(orientation, GridPosition(row, col))
+        if orientation == NORTH and self.north_load is not None:
+            # Only the rocks that moved since the last checkpoint change the load
+            for position, before in self.changes.items():
+                if before == ROUNDED:
+                    self.north_load -= self.load_score(NORTH, position)
+                if self[position] == ROUNDED:
+                    self.north_load += self.load_score(NORTH, position)
+            self.checkpoint()
+            return self.north_load
+
+        load = sum([self.load_score(orientation, GridPosition(row, col))
                     for col in self.col_range
                     for row in self.row_range
                     if self[GridPosition(row, col)] == ROUNDED])
+        if orientation == NORTH:
+            self.north_load = load
+            self.checkpoint()
+        return load
 
 
 class Day14(Puzzle):
@@ -79,9 +107,9 @@ class Day14(Puzzle):
         return load
 
     def part2(self, platform: Platform) -> PuzzleResult:
-        platform.spin(1_000)
+        platform.spin(1_000_000_000)
         return platform.load(NORTH)
 
 
 puzzle = Day14()
-puzzle.run(136, 64, testonly=True)  # 95254 in 210 seconds
+puzzle.run(136, 64)
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
-from collections import Counter
+from collections import Counter, deque
 from enum import Enum
 
 from common import *
+from common import counter
+
+
+BEAMS = counter('beams')
 
 
 class Direction(Enum):
@@ -28,6 +32,8 @@ class Path:
         return f'{self.direction.name} from {self.position}'
 
 
+EDGE = 'X'  # The border around the cave
+
 MIRROR: dict[str, dict[Direction: Direction]] = {
     '/': {
         Direction.RIGHT: Direction.UP,
@@ -58,7 +64,7 @@ SPLITTER = {
 class Cave(Grid):
 
     def __init__(self, lines):
-        super().__init__(lines)
+        super().__init__(lines, border=1, border_value=EDGE)
 
         self.counts = Counter()
 
@@ -67,35 +73,34 @@ class Cave(Grid):
             return self.counts[start]
 
         energized: set[GridPosition] = set()
-        beams: list[Path] = [start]
-        history: set[Path] = set()
+        beams: deque[Path] = deque([start])
+        history: set[Path] = {start}
 
-        while len(beams):
+        while beams:
             turn1 = turn2 = None
 
-            path = beams.pop(0)
-            if path in history:
-                continue
-
-            history.add(path)
+            path = beams.popleft()
+            BEAMS.add()
             energized.add(path.position)
 
             device = self[path.position]
             if device in MIRROR:
                 turn1 = path + MIRROR[device][path.direction]
-                beams.extend(self.valid(turn1))
+                beams.extend(self.valid(history, turn1))
             elif device in SPLITTER and path.direction in SPLITTER[device]:
                 turn1 = path + SPLITTER[device][path.direction][0]
                 turn2 = path + SPLITTER[device][path.direction][1]
-                beams.extend(self.valid(turn1, turn2))
+                beams.extend(self.valid(history, turn1, turn2))
             else: # just keep swimming
-                beams.extend(self.valid(path + path.direction))
+                beams.extend(self.valid(history, path + path.direction))
 
         self.counts[start] = len(energized)
         return self.counts[start]
 
-    def valid(self, *paths: Path) -> list[Path]:
-        valid = [p for p in paths if self.inbounds(p.position)]
+    def valid(self, history: set[Path], *paths: Path) -> list[Path]:
+        # Paths are marked as seen when queued, so each is queued only once
+        valid = [p for p in paths if p not in history and self[p.position] != EDGE]
+        history.update(valid)
         return valid
 
     def max_power(self):
@@ -1,56 +1,68 @@
 from __future__ import annotations
 
-from typing import Any
+from typing import Iterable
 
 from common import *
+from common import PACKED_ORTHOGONAL, StateSearch
 
-DIRECTIONS = [
-    GridDirection(1, 0),
-    GridDirection(0, 1),
-    GridDirection(-1, 0),
-    GridDirection(0, -1),
-]
+DIRECTIONS = PACKED_ORTHOGONAL  # down, right, up, left
 
 
-class Crucible(Grid, AstarSearch):
+class Crucible(Grid, StateSearch):
+    """Search for the cheapest way to move a crucible between opposite corners
+
+    A crucible moves between min_run and max_run blocks in a straight line,
+    then turns left or right. So each move is a whole straight run, and the
+    state only needs the position and the axis of the next run: a packed
+    position shifted left, with the low bit 0 for vertical and 1 for horizontal.
+    """
 
     def __init__(self, lines):
-        super().__init__(lines, conversion=int)
-
-        self.origin = GridPosition(0, 0)
-        self.target = GridPosition(self.rows-1, self.cols-1)
-
-    def neighbors(self, node: Any) -> list[Any]:
-        """Return a list of all of the neighbors of a node"""
-        directions = set(DIRECTIONS)
-
-        prev1 = self.backtrack(node)
-        if prev1 is not None:
-            backwards = prev1 - node
-            directions.remove(backwards)
-            prev2 = self.backtrack(prev1)
-            if prev2 is not None:
-                prev3 = self.backtrack(prev2)
-                if prev3 is not None:
-                    if backwards == (prev2-prev1) == (prev3-prev2):
-                        forwards = 0 - backwards
-                        directions.remove(forwards)
-
-        neighbors = [n for n in
-                     [node + d for d in directions]
-                     if self.inbounds(n)]
-        return neighbors
-
-    def distance(self, src: Any, dst: Any) -> float:
-        """Distance between two nodes"""
-        # distance = GridOrthogonalDistance(src, dst)
-        # distance = GridRow(src)-GridRow(dst) + GridCol(src)-GridCol(dst)
-        cost = self[dst]
-        return cost
-
-    def heuristic(self, node: Any) -> float:
-        """Estimate the cost to get to the goal from a node"""
-        return GridOrthogonalDistance(node, self.target)
+        super().__init__(lines, conversion=int, positions='packed', border=1)
+
+        self.origin = self.position(0, 0)
+        self.target = self.position(self.rows-1, self.cols-1)
+        self.min_run, self.max_run = 1, 3
+
+    def state_neighbors(self, state: int) -> Iterable[tuple[int, int]]:
+        position, axis = state >> 1, state & 1
+        turned = axis ^ 1
+        for direction in DIRECTIONS[axis::2]:
+            cost = 0
+            neighbor = position
+            for run in range(1, self.max_run + 1):
+                neighbor += direction
+                loss = self[neighbor]
+                if loss is None:  # None: the border
+                    break
+                cost += loss
+                if run >= self.min_run:
+                    yield neighbor << 1 | turned, cost
+
+    def is_goal(self, state: int) -> bool:
+        return state >> 1 == self.target
+
+    def heuristic(self, state: int) -> float:
+        """Estimate the cost to get to the goal from a state"""
+        return GridOrthogonalDistance(state >> 1, self.target)
+
+    def least_heat_loss(self, min_run: int, max_run: int) -> tuple[int, list[int]]:
+        """The heat lost on the best route, and the positions the route turns at"""
+        self.min_run, self.max_run = min_run, max_run
+        loss, states = self.search(self.origin << 1, self.origin << 1 | 1)
+        return loss, [state >> 1 for state in states]
+
+    def draw(self, turns: list[int]) -> None:
+        drawn = self.layer('path', symbols={1: '.', 2: '*'})
+        drawn[turns[0]] = 1
+        for src, dst in zip(turns, turns[1:]):
+            step = (dst - src) // GridOrthogonalDistance(src, dst)
+            while src != dst:
+                src += step
+                drawn[src] = 2
+
+        for row in self.row_range:
+            print(f'{self.render_row(row)} : {self.render_row(row, ["path"])}')
 
 
 class Day17(Puzzle):
@@ -60,22 +72,14 @@ class Day17(Puzzle):
         return Crucible(self.read_stripped(filename))
 
     def part1(self, data: Crucible) -> PuzzleResult:
-        path = data.traverse(data.origin, data.target)
-        score = sum([data[node] for node in path[1:]])
-
-        temp = Grid(data)
-        temp[path[0]] = '.'
-        for pos in path[1:]:
-            temp[pos] = '*'
-
-        for row in data.row_range:
-            print(f'{data.render_row(row)} : {temp.render_row(row)}')
-
-        return score
+        loss, turns = data.least_heat_loss(1, 3)
+        data.draw(turns)
+        return loss
 
     def part2(self, data: Crucible) -> PuzzleResult:
-        return 0
+        loss, turns = data.least_heat_loss(4, 10)
+        return loss
 
 
 puzzle = Day17()
-puzzle.run(102)
+puzzle.run(102, 94)
@@ -7,6 +7,7 @@ from itertools import pairwise
 from operator import attrgetter
 
 from common import *
+from common import BitGrid, CompressedGrid
 
 INFINITY = 999_999_999
 
@@ -18,12 +19,6 @@ class Direction(Enum):
     L = GridDirection(0, -1)
 
 
-@dataclass
-class Boundaries:
-    walls: set[int] = field(default_factory=set)
-    runs: set[range] = field(default_factory=set)
-
-
 @dataclass
 class Step:
     direction: GridDirection
@@ -39,91 +34,71 @@ class Step:
         dir, dis, rgb = match.groups()
         return cls(Direction[dir], int(dis), rgb)
 
+    def decoded(self) -> Step:
+        """The step hidden in the color: five hex digits of distance, then the direction"""
+        return Step(Direction['RDLU'[int(self.color[5])]], int(self.color[:5], 16), self.color)
+
 
 class Lagoon(Grid):
 
     def __init__(self, lines):
-        super().__init__(sparse=True, dynamic=True)
+        super().__init__(sparse=True, dynamic=True, storage='tiled')
         self.steps: list[Step] = [Step.parse(line) for line in lines]
-        self.bounds: dict[int, Boundaries] = {}
 
     def load_grid_from_steps(self) -> int:
         position = GridPosition(0, 0)
-        self[position] = '#'
+        trench = [position]
 
         for step in self.steps:
             for _ in range(step.distance):
                 position = position + step.direction.value
-                self[position] = '#'
+                trench.append(position)
 
+        self.update(trench, '#')
         return len(self)
 
     def grid_fill(self) -> int:
-        # https://en.wikipedia.org/wiki/Flood_fill
-
-        queue: list[GridPosition] = []
-
-        marking = False
-        row = GridRow(self.center)
-        for col in self.col_range:
-            position = GridPosition(row, col)
-            if not marking and position in self:
-                marking = True
-            elif marking and position not in self:
-                queue.append(position)
+        # Flood the ground outside the trench in from the border, growing
+        # every row of the flood at once, then count whatever is left
+        trench = BitGrid.collect(self)
+        ground = ~trench
+
+        outside = ground.empty()
+        edges = 1 | 1 << (self.cols - 1)
+        outside.bits = [edges] * self.rows
+        outside.bits[0] = outside.bits[-1] = outside.full
+        outside &= ground
+
+        while True:
+            grown = (outside | outside.shifted(1) | outside.shifted(-1) |
+                     outside.shifted(0, 1) | outside.shifted(0, -1)) & ground
+            if grown == outside:
                 break
+            outside = grown
 
-        while len(queue):
-            node = queue.pop(0)
-            self[node] = '#'
-            for direction in Direction:
-                next = node + direction.value
-                if next not in self:
-                    queue.append(next)
+        return self.rows * self.cols - len(outside)
 
-        return len(self)
+    def dig(self, steps: list[Step]) -> int:
+        # Only the rows and columns where the trench turns matter: compress
+        # the plan down to them (plus a border to flood around), then weigh
+        # every compressed cell that isn't outside by the area it stands for
+        corners = [GridPosition(0, 0)]
+        for step in steps:
+            corners.append(corners[-1] + step.direction.value * step.distance)
 
-    def load_bounds_from_steps(self) -> int:
-        position = GridPosition(0, 0)
-        self.bounds[0] = Boundaries({0})
-        for step in self.steps:
-            target = position + step.direction.value * step.distance
-
-            if step.direction == Direction.U:
-                col = GridCol(position)
-                for row in range(GridRow(target), GridRow(position)+1):
-                    self.bounds.setdefault(row, Boundaries()).walls.add(col)
-            elif step.direction == Direction.D:
-                col = GridCol(position)
-                for row in range(GridRow(position), GridRow(target)+1):
-                    self.bounds.setdefault(row, Boundaries()).walls.add(col)
-            elif step.direction == Direction.R:
-                run = range(GridCol(position), GridCol(target))
-                self.bounds.setdefault(
-                    GridRow(position), Boundaries()).runs.add(run)
-            elif step.direction == Direction.L:
-                run = range(GridCol(target), GridCol(position))
-                self.bounds.setdefault(
-                    GridRow(position), Boundaries()).runs.add(run)
-
-            position = target
-
-        return sum(step.distance for step in self.steps)
-
-    def bounds_fill(self) -> int:
-        count = 0
-
-        for row, bounds in self.bounds.items():
-            inside = False
-            last = None
-            for start, stop in pairwise(sorted(bounds.walls)):
-                inside = not inside
-                if range(start, stop) in bounds.runs:
-                    inside = True
-                if inside:
-                    count += stop-start+1
-
-        return count
+        rows = [GridRow(p) for p in corners]
+        cols = [GridCol(p) for p in corners]
+        plan = CompressedGrid(rows + [r + 1 for r in rows] + [min(rows) - 1, max(rows) + 2],
+                              cols + [c + 1 for c in cols] + [min(cols) - 1, max(cols) + 2],
+                              sparse=True)
+
+        for start, end in pairwise(corners):
+            top, bottom = sorted([GridRow(start), GridRow(end)])
+            left, right = sorted([GridCol(start), GridCol(end)])
+            plan.fill(top, left, bottom + 1, right + 1, '#')
+
+        outside = plan.flood(plan.position(0, 0), lambda cell: cell is None)
+        return plan.total_area - plan.area(outside)
 
 
 class Day18(Puzzle):
@@ -137,13 +112,12 @@ class Day18(Puzzle):
             mf.write(str(data))
 
     def part1(self, data: Lagoon) -> PuzzleResult:
-        edges = data.load_bounds_from_steps()
-        fills = data.bounds_fill()
-        return fills
+        data.load_grid_from_steps()
+        return data.grid_fill()
 
     def part2(self, data: Lagoon) -> PuzzleResult:
-        return 0
+        return data.dig([step.decoded() for step in data.steps])
 
 
 puzzle = Day18()
-puzzle.run(62)
+puzzle.run(62, 952408144115)
@@ -5,11 +5,14 @@ from enum import Enum
 from typing import Optional
 
 from common import *
+from common import counter
 
 PulseType = bool
 LOW = False
 HIGH = True
 
+PULSES = counter('pulses')
+
 
 class ModuleType(Enum):
     BROADCAST = 1
@@ -97,6 +100,7 @@ class Propagator:
             pulse = action.pulse
             source = action.source
             module = action.target
+            PULSES.add()
             self.counts[pulse] += 1
             if pulse == LOW:
                 self.low[module] += 1
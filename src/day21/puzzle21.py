@@ -3,6 +3,7 @@ from __future__ import annotations
 from typing import Optional
 
 from common import *
+from common import BitGrid
 
 DIRECTIONS = [
     GridDirection(1, 0),
@@ -12,33 +13,25 @@ DIRECTIONS = [
 ]
 
 
-class Garden:
+def passable(value: str) -> bool:
+    return value != '#'
 
-    def __init__(self, lines: str | list[str]):
-        if isinstance(lines, str):
-            lines = lines.split('\n')
 
-        self.rows = range(len(lines))
-        self.cols = range(len(lines[0]))
-        self.start: GridPosition
-        self.rocks: list[GridPosition] = []
+class Garden(Grid):
+
+    def __init__(self, lines: str | list[str]):
+        super().__init__(lines)
 
-        for row, line in enumerate(lines):
-            for col, ch in enumerate(line):
-                if ch == 'S':
-                    self.start = GridPosition(row, col)
-                elif ch == '#':
-                    self.rocks.append(GridPosition(row, col))
+        self.start: GridPosition = next(p for p, ch in self.items() if ch == 'S')
+        self.rocks: BitGrid = BitGrid.collect(self, lambda ch: ch == '#')
 
     def valid(self, position: GridPosition, infinite: bool) -> bool:
         if infinite:
-            row = GridRow(position) % self.rows.stop
-            col = GridCol(position) % self.cols.stop
+            row = GridRow(position) % self.rows
+            col = GridCol(position) % self.cols
             return GridPosition(row, col) not in self.rocks
         else:
-            return (GridRow(position) in self.rows and
-                    GridCol(position) in self.cols and
-                    position not in self.rocks)
+            return self.inbounds(position) and position not in self.rocks
 
     def one_step(self, previous: set[GridPosition], infinite: bool = False) -> set(GridPosition):
         reachable: set(GridPosition) = set()
@@ -52,6 +45,11 @@ class Garden:
         return reachable
 
     def steps(self, steps: int, infinite: bool = False) -> int:
+        if not infinite:
+            # Reachable in exactly n steps = within n steps, with the same parity
+            distances = self.distances(self.start, passable, limit=steps)
+            return sum(1 for d in distances if d >= 0 and d % 2 == steps % 2)
+
         positions = {self.start}
 
         for i in range(1, steps+1):
@@ -1,7 +1,14 @@
 from __future__ import annotations
 
+import io
+import random
+
+from array import array
+from bisect import bisect_right
+from collections import deque
 from collections.abc import MutableMapping, KeysView, ItemsView, ValuesView
-from typing import Any, Iterator, Mapping, Optional
+from itertools import pairwise
+from typing import IO, Any, Callable, Iterable, Iterator, Mapping, Optional
 
 GridPosition = GridDirection = complex
 
@@ -14,10 +21,461 @@ def GridCol(position: GridPosition) -> int:
     return int(position.imag)
 
 
-def GridOrthogonalDistance(src: GridPosition, tgt: GridPosition) -> int:
+# Packed positions are ints holding the row in the high bits and the column,
+# biased to be non-negative, in the low 32 bits. They add like complex
+# positions (position + direction), hash faster, and never lose precision.
+# Columns must stay within +/- 2**31.
+
+PACKED_SHIFT = 32
+PACKED_BIAS = 1 << 31
+PACKED_MASK = (1 << 32) - 1
+
+
+def PackedPosition(row: int, col: int) -> int:
+    return (row << PACKED_SHIFT) + col + PACKED_BIAS
+
+
+def PackedDirection(drow: int, dcol: int) -> int:
+    return (drow << PACKED_SHIFT) + dcol
+
+
+def PackedRow(position: int) -> int:
+    return position >> PACKED_SHIFT
+
+
+def PackedCol(position: int) -> int:
+    return (position & PACKED_MASK) - PACKED_BIAS
+
+
+# Down, right, up, left
+GRID_ORTHOGONAL = (GridDirection(1, 0), GridDirection(0, 1), GridDirection(-1, 0), GridDirection(0, -1))
+PACKED_ORTHOGONAL = tuple(PackedDirection(GridRow(d), GridCol(d)) for d in GRID_ORTHOGONAL)
+
+
+def GridOrthogonalDistance(src: GridPosition | int, tgt: GridPosition | int) -> int:
+    if isinstance(src, int):
+        return abs(PackedRow(tgt)-PackedRow(src))+abs(PackedCol(tgt)-PackedCol(src))
     return abs(GridRow(tgt)-GridRow(src))+abs(GridCol(tgt)-GridCol(src))
 
 
+# Zobrist keys: a random 64-bit number for each (position, value) pair,
+# made on first use and shared by every grid, so equal grids fingerprint alike.
+
+_ZOBRIST: dict[tuple, int] = {}
+_ZOBRIST_RANDOM = random.Random(2023)
+_ABSENT = object()
+
+# Neighbor tables cached per grid; the oldest is dropped to make room.
+_ADJACENCY_LIMIT = 8
+
+# A dynamic grid folds the positions written to it into its bounds when they
+# are next read, or once this many are waiting, so long write loops stay small.
+_PENDING_LIMIT = 4096
+
+
+def _zobrist(key: GridPosition, value: Any) -> int:
+    if value is _ABSENT:
+        return 0
+    try:
+        return _ZOBRIST[key, value]
+    except KeyError:
+        bits = _ZOBRIST[key, value] = _ZOBRIST_RANDOM.getrandbits(64)
+        return bits
+
+
+class DenseStore(MutableMapping):
+    """Row-major cell storage for a rectangular grid
+
+    Cells are palette coded: `_codes` holds one byte per cell, which indexes
+    `_palette`. Code 0 marks an empty cell, and `_palette[0]` holds the value
+    bulk reads (`row`, `col`) return for empty cells. Once a grid holds more
+    than 255 distinct values the codes widen to a 32-bit array.
+    Values must be hashable.
+    """
+
+    _position = staticmethod(GridPosition)
+
+    def __init__(self, rows: range, cols: range, default: Any = None,
+                 codes: bytearray | array | memoryview = None, palette: list = None, count: int = None):
+        self._row0: int = rows.start
+        self._col0: int = cols.start
+        self._rows: int = len(rows)
+        self._cols: int = len(cols)
+
+        self._codes = bytearray(self._rows * self._cols) if codes is None else codes
+        self._palette: list = palette or [default]
+        self._lookup: dict[Any, int] = {v: i for i, v in enumerate(self._palette) if i}
+
+        if codes is None:
+            self._count = 0
+        elif count is not None:
+            self._count = count
+        elif isinstance(codes, memoryview):
+            self._count = len(codes) - codes.tobytes().count(0) if codes.itemsize == 1 \
+                else sum(1 for code in codes if code)
+        else:
+            self._count = len(codes) - codes.count(0)
+
+    @classmethod
+    def collect(cls, rows: range, cols: range, cells: Mapping, default: Any = None) -> DenseStore:
+        store = cls(rows, cols, default)
+        for key, value in cells.items():
+            store[key] = value
+        return store
+
+    @property
+    def row_range(self) -> range:
+        return range(self._row0, self._row0 + self._rows)
+
+    @property
+    def col_range(self) -> range:
+        return range(self._col0, self._col0 + self._cols)
+
+    @property
+    def typecode(self) -> str:
+        if isinstance(self._codes, array):
+            return self._codes.typecode
+        return self._codes.format if isinstance(self._codes, memoryview) else 'B'
+
+    def _index(self, key: GridPosition) -> int:
+        r = int(key.real) - self._row0
+        c = int(key.imag) - self._col0
+        if 0 <= r < self._rows and 0 <= c < self._cols:
+            return r * self._cols + c
+        return -1
+
+    def _encode(self, value: Any) -> int:
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self._palette)
+            self._palette.append(value)
+            if code == 256:
+                self._codes = array('I', iter(self._codes))  # Not frombytes
+        return code
+
+    def __getitem__(self, key: GridPosition) -> Any:
+        # _index is inlined in the two hot paths
+        r = int(key.real) - self._row0
+        c = int(key.imag) - self._col0
+        if 0 <= r < self._rows and 0 <= c < self._cols:
+            code = self._codes[r * self._cols + c]
+            if code:
+                return self._palette[code]
+        raise KeyError(key)
+
+    def __setitem__(self, key: GridPosition, value: Any) -> None:
+        index = self._index(key)
+        if index < 0:
+            raise IndexError(key)
+        empty = not self._codes[index]
+        code = self._lookup.get(value)
+        self._codes[index] = self._encode(value) if code is None else code
+        if empty:
+            self._count += 1
+
+    def __delitem__(self, key: GridPosition) -> None:
+        index = self._index(key)
+        if index < 0 or not self._codes[index]:
+            raise KeyError(key)
+        self._codes[index] = 0
+        self._count -= 1
+
+    def __contains__(self, key: GridPosition) -> bool:
+        index = self._index(key)
+        return index >= 0 and self._codes[index] != 0
+
+    def __iter__(self) -> Iterator[GridPosition]:
+        codes = self._codes
+        for r in range(self._rows):
+            base = r * self._cols
+            for c in range(self._cols):
+                if codes[base + c]:
+                    yield self._position(r + self._row0, c + self._col0)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, DenseStore) and self._palette == other._palette and \
+                (self._row0, self._col0, self._rows, self._cols) == \
+                (other._row0, other._col0, other._rows, other._cols):
+            return self._codes == other._codes
+        return super().__eq__(other)
+
+    def copy(self) -> DenseStore:
+        codes = bytearray(self._codes) if self.typecode == 'B' else array(self.typecode, self._codes)
+        return self.__class__(self.row_range, self.col_range, codes=codes, palette=self._palette.copy())
+
+    def empty(self) -> DenseStore:
+        return self.__class__(self.row_range, self.col_range, self._palette[0])
+
+    def clear(self) -> None:
+        zero = bytes(1) if self.typecode == 'B' else array(self.typecode, [0])
+        self._codes[:] = zero * len(self._codes)
+        self._count = 0
+
+    def load(self, lines: list[str], table: dict[str, Any], transpose: bool = False, flip: bool = False) -> None:
+        """Fill the store from lines of characters, a whole line at a time
+
+        table maps every character to its value, or to _ABSENT to leave the
+        cell empty. Line i fills row i, or column i when transposed; flip
+        reverses the row order. Each line is coded with one `str.translate`
+        and stored with one (possibly strided) slice assignment.
+        """
+        codes = {ord(ch): 0 if value is _ABSENT else self._encode(value) for ch, value in table.items()}
+        if self.typecode == 'B':
+            translation = str.maketrans({ch: chr(code) for ch, code in codes.items()})
+            def encode(line): return line.translate(translation).encode('latin-1')
+        else:
+            def encode(line): return array(self.typecode, map(codes.__getitem__, map(ord, line)))
+
+        width = self._rows if transpose else self._cols
+        for i, line in enumerate(lines):
+            if len(line) != width:
+                raise ValueError(f'Line {i} has {len(line)} cells, not {width}')
+            row = encode(line)
+            if transpose:
+                self._codes[i::self._cols] = row[::-1] if flip else row
+            else:
+                start = (self._rows - 1 - i if flip else i) * self._cols
+                self._codes[start:start + self._cols] = row
+
+        self._count = len(self._codes) - self._codes.count(0)
+
+    def row(self, r: int) -> list[Any]:
+        """All of the values in a row; empty cells read as the default"""
+        start = (r - self._row0) * self._cols
+        if not 0 <= start < len(self._codes):
+            raise IndexError(r)
+        palette = self._palette
+        return [palette[code] for code in self._codes[start:start + self._cols]]
+
+    def col(self, c: int) -> list[Any]:
+        """All of the values in a column; empty cells read as the default"""
+        start = c - self._col0
+        if not 0 <= start < self._cols:
+            raise IndexError(c)
+        palette = self._palette
+        return [palette[code] for code in self._codes[start::self._cols]]
+
+
+class PackedKeys:
+    """Mixin for DenseStore and NumpyStore: index the cells by packed positions"""
+
+    _position = staticmethod(PackedPosition)
+
+    def _index(self, key: int) -> int:
+        r = (key >> PACKED_SHIFT) - self._row0
+        c = (key & PACKED_MASK) - PACKED_BIAS - self._col0
+        if 0 <= r < self._rows and 0 <= c < self._cols:
+            return r * self._cols + c
+        return -1
+
+    def __getitem__(self, key: int) -> Any:
+        r = (key >> PACKED_SHIFT) - self._row0
+        c = (key & PACKED_MASK) - PACKED_BIAS - self._col0
+        if 0 <= r < self._rows and 0 <= c < self._cols:
+            code = self._codes[r * self._cols + c]
+            if code:
+                return self._palette[code]
+        raise KeyError(key)
+
+
+class PackedDenseStore(PackedKeys, DenseStore):
+    pass
+
+
+class NumpyStore(DenseStore):
+    """A DenseStore that also exposes its cells as NumPy arrays
+
+    The codes stay in the DenseStore buffer, and `codes` is a zero-copy
+    (rows, cols) view of them, so per-cell writes and array reads always agree.
+    Within one store equal values have equal codes, so comparisons between
+    rows or columns can work on codes; `values` decodes them through the palette.
+    Requires NumPy.
+    """
+
+    def __init__(self, *args, **keywords):
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError('NumPy storage needs the numpy package') from None
+
+        self._np = numpy
+        super().__init__(*args, **keywords)
+
+    @property
+    def codes(self):
+        dtype = self._np.uint8 if self.typecode == 'B' else self._np.uint32
+        return self._np.frombuffer(self._codes, dtype).reshape(self._rows, self._cols)
+
+    @property
+    def palette(self):
+        """The palette as a NumPy array, so `palette[codes]` decodes cells"""
+        values = self._np.array(self._palette[1:])
+        palette = self._np.empty(len(self._palette), values.dtype if len(values) else object)
+        palette[1:] = values
+        palette[0] = self._palette[0] if values.dtype == object else palette.dtype.type()
+        return palette
+
+    @property
+    def values(self):
+        return self.palette[self.codes]
+
+    def code(self, value: Any) -> int:
+        """The code for a value, or -1 (which matches no cell) if it isn't in the grid"""
+        return self._lookup.get(value, -1)
+
+
+class PackedNumpyStore(PackedKeys, NumpyStore):
+    pass
+
+
+class TiledStore(MutableMapping):
+    """Unbounded cell storage in square dense tiles
+
+    Tiles are `TILE` x `TILE` blocks of palette codes (as in DenseStore),
+    made on the first write into them and kept in a dict keyed by
+    (row // TILE, col // TILE). Memory scales with the area written, not
+    the distance between cells, and neighboring cells share a tile.
+    `palette[0]` is the value of every cell in untouched tiles.
+
+    `copy` shares the tiles: both stores copy a shared tile (and only that
+    tile) the first time they write to it.
+    """
+
+    SHIFT = 6
+    TILE = 1 << SHIFT
+    MASK = TILE - 1
+
+    _position = staticmethod(GridPosition)
+    _split_position = staticmethod(lambda key: (int(key.real), int(key.imag)))
+
+    def __init__(self, default: Any = None, tiles: dict[tuple[int, int], bytearray | array] = None,
+                 palette: list = None):
+        self._tiles: dict[tuple[int, int], bytearray | array] = {} if tiles is None else tiles
+        self._palette: list = palette or [default]
+        self._lookup: dict[Any, int] = {v: i for i, v in enumerate(self._palette) if i}
+        self._count: int = sum(len(codes) - codes.count(0) for codes in self._tiles.values())
+        self._borrowed: set[tuple[int, int]] = set()  # Tiles shared with a copy
+
+    @property
+    def typecode(self) -> str:
+        return 'I' if len(self._palette) > 256 else 'B'
+
+    def _encode(self, value: Any) -> int:
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self._palette)
+            self._palette.append(value)
+            if code == 256:
+                for tile, codes in self._tiles.items():
+                    self._tiles[tile] = array('I', iter(codes))
+                self._borrowed.clear()
+        return code
+
+    def __getitem__(self, key: GridPosition) -> Any:
+        r, c = self._split_position(key)
+        codes = self._tiles.get((r >> self.SHIFT, c >> self.SHIFT))
+        if codes is not None:
+            code = codes[(r & self.MASK) << self.SHIFT | c & self.MASK]
+            if code:
+                return self._palette[code]
+        raise KeyError(key)
+
+    def __setitem__(self, key: GridPosition, value: Any) -> None:
+        r, c = self._split_position(key)
+        tile = (r >> self.SHIFT, c >> self.SHIFT)
+        codes = self._tiles.get(tile)
+        if codes is None:
+            codes = self._tiles[tile] = bytearray(self.TILE * self.TILE) if self.typecode == 'B' \
+                else array('I', bytes(4 * self.TILE * self.TILE))
+        elif self._borrowed and tile in self._borrowed:
+            codes = self._own(tile)
+        index = (r & self.MASK) << self.SHIFT | c & self.MASK
+        if not codes[index]:
+            self._count += 1
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._encode(value)
+            codes = self._tiles[tile]  # May have widened
+        codes[index] = code
+
+    def __delitem__(self, key: GridPosition) -> None:
+        r, c = self._split_position(key)
+        tile = (r >> self.SHIFT, c >> self.SHIFT)
+        codes = self._tiles.get(tile)
+        index = (r & self.MASK) << self.SHIFT | c & self.MASK
+        if codes is None or not codes[index]:
+            raise KeyError(key)
+        if tile in self._borrowed:
+            codes = self._own(tile)
+        codes[index] = 0
+        self._count -= 1
+
+    def __contains__(self, key: GridPosition) -> bool:
+        r, c = self._split_position(key)
+        codes = self._tiles.get((r >> self.SHIFT, c >> self.SHIFT))
+        return codes is not None and codes[(r & self.MASK) << self.SHIFT | c & self.MASK] != 0
+
+    def __iter__(self) -> Iterator[GridPosition]:
+        for key, _ in self.cells():
+            yield key
+
+    def __len__(self) -> int:
+        return self._count
+
+    def items(self) -> ItemsView:
+        return TiledItems(self)
+
+    def cells(self) -> Iterator[tuple[GridPosition, Any]]:
+        """Every stored (position, value), a tile at a time, row-major within each tile"""
+        position, palette = self._position, self._palette
+        for (tr, tc), codes in self._tiles.items():
+            row0, col0 = tr << self.SHIFT, tc << self.SHIFT
+            for index, code in enumerate(codes):
+                if code:
+                    yield position(row0 + (index >> self.SHIFT), col0 + (index & self.MASK)), palette[code]
+
+    def tiles(self) -> Iterator[tuple[int, int, bytearray | array]]:
+        """(first row, first col, codes) for each tile, with the codes row-major"""
+        for (tr, tc), codes in self._tiles.items():
+            yield tr << self.SHIFT, tc << self.SHIFT, codes
+
+    def _own(self, tile: tuple[int, int]) -> bytearray | array:
+        """Replace a tile shared with a copy by a private copy of it"""
+        self._borrowed.discard(tile)
+        codes = self._tiles[tile] = self._tiles[tile][:]
+        return codes
+
+    def copy(self) -> TiledStore:
+        # Palettes only grow, so the shared tiles' codes mean the same in both
+        store = self.__class__(tiles=dict(self._tiles), palette=self._palette.copy())
+        store._borrowed = set(self._tiles)
+        self._borrowed = set(self._tiles)
+        return store
+
+    def empty(self) -> TiledStore:
+        return self.__class__(self._palette[0])
+
+    def clear(self) -> None:
+        self._tiles.clear()
+        self._borrowed.clear()
+        self._count = 0
+
+
+class TiledItems(ItemsView):
+    """Items of a TiledStore, iterated a tile at a time"""
+
+    def __iter__(self) -> Iterator[tuple[GridPosition, Any]]:
+        return self._mapping.cells()
+
+
+class PackedTiledStore(TiledStore):
+    _position = staticmethod(PackedPosition)
+    _split_position = staticmethod(lambda key: (key >> PACKED_SHIFT, (key & PACKED_MASK) - PACKED_BIAS))
+
+
 class Grid(MutableMapping):
 
     _properties = [
@@ -27,50 +485,149 @@ class Grid(MutableMapping):
         '_sparse',
         '_origin',
         '_default',
+        '_positions',
     ]
 
+    _stores = {
+        ('dense', 'complex'): DenseStore,
+        ('dense', 'packed'): PackedDenseStore,
+        ('numpy', 'complex'): NumpyStore,
+        ('numpy', 'packed'): PackedNumpyStore,
+        ('tiled', 'complex'): TiledStore,
+        ('tiled', 'packed'): PackedTiledStore,
+    }
+
     def __init__(self, source: list[str] | Grid = None, **keywords):
-        self._grid: Mapping[GridPosition, Any] = {}
+        self._grid: MutableMapping[GridPosition, Any] = {}
         self._offset: int = 0
         self._sparse: bool = False
         self._origin: str = 'ul'
         self._default: Any = None
         self._dynamic: bool = False
+        self._positions: str = 'complex'
+        self._adjacency: dict[tuple, Adjacency] = {}
+        self._fingerprint: Optional[int] = None
+        self._shared: Optional[list[int]] = None  # [number of grids sharing the storage], until a write
+        self._readonly: bool = False  # Storage mapped from a file or shared memory
+        self._layers: dict[str, Layer | BitLayer] = {}
+        self._border: dict[GridPosition, Any] = {}
+        self._changes: Optional[dict[GridPosition, Any]] = None  # Since the last checkpoint
 
         self._min_row: int = 1_000_000_000_000
         self._max_row: int = -1_000_000_000_000
         self._min_col: int = 1_000_000_000_000
         self._max_col: int = -1_000_000_000_000
+        self._pending: list[GridPosition] = []  # Written to a dynamic grid, but not yet in its bounds
 
         if source is None:
             self._rows = keywords.get('rows', 0)
             self._cols = keywords.get('cols', 0)
             self._init(**keywords)
+            self._allocate(**keywords)
         elif issubclass(source.__class__, Grid):
+            source._widen()
             for p in self._properties:
                 setattr(self, p, getattr(source, p))
+            self._border = source._border
             self._init(**keywords)
             empty = keywords.get('empty', False)
-            if not empty:
-                self._grid = source._grid.copy()
+            if isinstance(source._grid, (dict, DenseStore, TiledStore)) and not empty:
+                # Copy on write: share the storage until either grid changes
+                self._grid = source._grid
+                self._shared = source._shared = source._shared or [1]
+                self._shared[0] += 1
+            elif isinstance(source._grid, (DenseStore, TiledStore)):
+                self._grid = source._grid.empty()
+            elif not empty:
+                self._grid = dict(source._grid)
         elif isinstance(source, list):
             self._init(**keywords)
             self._parse(source, **keywords)
         elif isinstance(source, str):
             self._init(**keywords)
             self._parse(source.strip().split('\n'), **keywords)
+        elif isinstance(source, (bytes, bytearray)):
+            self._init(**keywords)
+            self._parse(source.decode('latin-1').strip().splitlines(), **keywords)
 
         else:
             raise ValueError('Invalid source: {source}')
 
+        if keywords.get('border'):
+            self._frame(keywords['border'], keywords.get('border_value'))
+
+    def _frame(self, width: int, value: Any) -> None:
+        """Surround the grid with a read-only border of sentinel cells
+
+        Reading a position up to width cells outside the bounds returns value,
+        so loops can stop at a sentinel instead of checking bounds. Border
+        cells live apart from the grid's own cells (they are not iterated,
+        counted or `in` the grid), and are only consulted when a read misses.
+        """
+        if self._dynamic:
+            raise ValueError('A border needs a grid with a fixed size')
+        rows, cols = self.row_range, self.col_range
+        outer_rows = range(rows.start - width, rows.stop + width)
+        outer_cols = range(cols.start - width, cols.stop + width)
+        self._border = {self.position(r, c): value
+                        for r in outer_rows for c in outer_cols
+                        if r not in rows or c not in cols}
+
     def _init(self, **keywords) -> None:
-        self._offset = keywords.get('offset', 0)
-        self._sparse = keywords.get('sparse', False)
-        self._origin = keywords.get('origin', 'ul')
-        self._default = keywords.get('default', None)
-        self._dynamic = keywords.get('dynamic', False)
+        self._offset = keywords.get('offset', self._offset)
+        self._sparse = keywords.get('sparse', self._sparse)
+        self._origin = keywords.get('origin', self._origin)
+        self._default = keywords.get('default', self._default)
+        self._dynamic = keywords.get('dynamic', self._dynamic)
+        self._positions = keywords.get('positions', self._positions)
+
+        if self._positions == 'complex':
+            self._key_type = complex
+            self.position, self.position_row, self.position_col = GridPosition, GridRow, GridCol
+        elif self._positions == 'packed':
+            self._key_type = int
+            self.position, self.position_row, self.position_col = PackedPosition, PackedRow, PackedCol
+        else:
+            raise ValueError(f'Invalid positions: {self._positions}')
+
+    def _allocate(self, **keywords) -> None:
+        """Set up the storage engine: 'dict' (the default), 'dense' or 'numpy'
+
+        A dense grid needs a fixed size, and uses a byte per cell rather than
+        a dict entry. Bulk operations (`row`, `col`, `==`) are much faster,
+        but single cell access is slower, as it can't use a C-level dict lookup.
+        A numpy grid is a dense grid that adds the NumPy methods below.
+        A tiled grid has no fixed size: it stores 64x64 dense tiles as they
+        are written, so it suits large, sparse or dynamic grids.
+
+        `border=width` (with `border_value`) adds sentinel cells around a
+        fixed-size grid; see `_frame`.
+
+        Independently, `positions='packed'` keys the grid by PackedPosition
+        ints instead of complex; use `position`, `position_row` and
+        `position_col` to build and take apart keys for either kind of grid.
+        """
+        storage = keywords.get('storage', 'dict')
+        if storage in ('dense', 'numpy') and (self._dynamic or not (self._rows and self._cols)):
+            raise ValueError('Dense storage needs a fixed size')
+
+        if storage in ('dense', 'numpy'):
+            store = self._stores[(storage, self._positions)]
+            self._grid = store(self.row_range, self.col_range, self._default)
+        elif storage == 'tiled':
+            self._grid = self._stores[(storage, self._positions)](self._default)
+        elif storage == 'dict':
+            self._grid = {}
+        else:
+            raise ValueError(f'Invalid storage: {storage}')
 
     def _parse(self, source: list[str], **keywords) -> None:
+        """Load lines of characters, converting each distinct character only once
+
+        Cells are stored a line at a time: a DenseStore codes each line with
+        `str.translate`, and a dict gets one `update` per line, with the keys
+        made by adding precomputed steps to the line's first position.
+        """
         transpose = keywords.get('transpose', False)
         conversion = keywords.get('conversion', None)
 
@@ -79,56 +636,158 @@ class Grid(MutableMapping):
 
         self._rows: int = cols if transpose else rows
         self._cols: int = rows if transpose else cols
+        self._allocate(**keywords)
 
-        for row, line in enumerate(source):
-            for col, value in enumerate(line):
-                r, c = row + self._offset, col + self._offset
-                if transpose:
-                    r, c = c, r
-                if self._origin == 'll':
-                    r = self._rows + self._offset - r
+        table = {}
+        for ch in dict.fromkeys(''.join(source)):  # in order of appearance, for a stable palette
+            value = conversion(ch) if conversion else ch
+            table[ch] = _ABSENT if self._sparse and value is None else value
 
-                if conversion:
-                    value = conversion(value)
+        flip = self._origin == 'll'
+        if isinstance(self._grid, DenseStore):
+            self._grid.load(source, table, transpose, flip)
+            return
 
-                if not (self._sparse and value is None):
-                    self._grid[GridPosition(r, c)] = value
+        # Line i is row (or, transposed, column) i + offset; the steps move
+        # along it, down the rows of a flipped or transposed grid
+        offset = self._offset
+        zero = self.position(0, 0)
+        width = max(map(len, source))
+        if transpose:
+            steps = [self.position((self._rows - 1 - j if flip else j) + offset, 0) - zero for j in range(width)]
+        else:
+            steps = [self.position(0, j + offset) - zero for j in range(width)]
+
+        cells = self._grid
+        sparse = _ABSENT in table.values()
+        for i, line in enumerate(source):
+            if transpose:
+                first = self.position(0, i + offset)
+            else:
+                first = self.position((rows - 1 - i if flip else i) + offset, 0)
+            pairs = zip(map(first.__add__, steps), map(table.__getitem__, line))
+            if sparse:
+                pairs = ((key, value) for key, value in pairs if value is not _ABSENT)
+            cells.update(pairs)
 
     def __repr__(self) -> str:
+        self._widen()
         return f'{self.__class__.__name__}({self._rows}, {self._cols})'
 
     def __getitem__(self, key: GridPosition) -> Any:
-        if isinstance(key, GridPosition):
-            if key in self._grid:
+        if isinstance(key, self._key_type):
+            try:
                 return self._grid[key]
-            elif self._sparse:
-                return self._default
-            else:
-                raise IndexError
+            except KeyError:
+                if key in self._border:
+                    return self._border[key]
+                if self._sparse:
+                    return self._default
+                raise IndexError(key) from None
         raise KeyError
 
     def __setitem__(self, key: GridPosition, value: Any) -> None:
-        if isinstance(key, GridPosition):
+        if isinstance(key, self._key_type):
+            if self._readonly:
+                self._reject()
+            if self._fingerprint is not None or self._changes is not None:
+                previous = self._grid.get(key, _ABSENT)
+            if self._shared:
+                self._unshare()
             self._grid[key] = value
+            if self._adjacency:
+                self._adjacency.clear()
+            # Only once the write has succeeded
+            if self._fingerprint is not None:
+                self._fingerprint ^= _zobrist(key, previous) ^ _zobrist(key, value)
+            if self._changes is not None and key not in self._changes:
+                self._changes[key] = self._default if previous is _ABSENT else previous
             if self._dynamic:
-                self._min_row = min(self._min_row, GridRow(key))
-                self._max_row = max(self._max_row, GridRow(key))
-                self._min_col = min(self._min_col, GridCol(key))
-                self._max_col = max(self._max_col, GridCol(key))
-                self._rows = self._max_row - self._min_row + 1
-                self._cols = self._max_col - self._min_col + 1
+                self._pending.append(key)
+                if len(self._pending) > _PENDING_LIMIT:
+                    self._widen()
             return
         raise KeyError
 
+    def update(self, cells: Any = (), value: Any = _ABSENT, /, **keywords) -> None:
+        """Set many cells at once
+
+        `update(positions, value)` sets every position to value, while
+        `update(mapping)` and `update(pairs)` work as they do for a dict.
+        Plain dict storage takes the whole batch in one C-level call.
+        """
+        if value is _ABSENT:
+            cells = dict(cells, **keywords)
+        else:
+            cells = dict.fromkeys(cells, value)
+
+        if (type(self._grid) is not dict or self._fingerprint is not None or self._changes is not None or
+                not set(map(type, cells)) <= {self._key_type}):
+            for key, value in cells.items():
+                self[key] = value
+            return
+
+        if self._shared:
+            self._unshare()
+        self._grid.update(cells)
+        self._adjacency.clear()
+        if self._dynamic:
+            self._pending.extend(cells)
+            if len(self._pending) > _PENDING_LIMIT:
+                self._widen()
+
+    def _reject(self) -> None:
+        raise TypeError(f'{self!r} is read-only; write to a copy, Grid(grid), instead')
+
+    def _unshare(self, keep: bool = True) -> None:
+        """Before the first write to a copy (or its source), take private storage
+
+        A dict or dense store is copied whole, with one C-level copy; a tiled
+        store shares its tiles with the copy, and copies each one on first write.
+        The last grid still sharing a store keeps it without copying. With
+        keep=False the grid takes an empty store instead.
+        """
+        group, self._shared = self._shared, None
+        group[0] -= 1
+        if group[0]:
+            if keep:
+                self._grid = self._grid.copy()
+            else:
+                self._grid = {} if isinstance(self._grid, dict) else self._grid.empty()
+
+    def _widen(self) -> None:
+        """Widen a dynamic grid's bounds to cover the positions written since they were last read"""
+        if self._pending:
+            rows = set(map(self.position_row, self._pending))
+            cols = set(map(self.position_col, self._pending))
+            self._pending.clear()
+            self._min_row = min(self._min_row, min(rows))
+            self._max_row = max(self._max_row, max(rows))
+            self._min_col = min(self._min_col, min(cols))
+            self._max_col = max(self._max_col, max(cols))
+            self._rows = self._max_row - self._min_row + 1
+            self._cols = self._max_col - self._min_col + 1
+
     def __delitem__(self, key: GridPosition) -> None:
-        if isinstance(key, GridPosition):
-            if key in self._grid:
+        if isinstance(key, self._key_type):
+            if self._readonly:
+                self._reject()
+            if self._shared and key in self._grid:
+                self._unshare()
+            previous = self._grid.get(key, _ABSENT)
+            try:
                 del self._grid[key]
+            except KeyError:
+                if not self._sparse:
+                    raise IndexError(key) from None
                 return
-            elif self._sparse:
-                return
-            else:
-                raise IndexError
+            if self._adjacency:
+                self._adjacency.clear()
+            if self._fingerprint is not None:
+                self._fingerprint ^= _zobrist(key, previous)
+            if self._changes is not None and key not in self._changes:
+                self._changes[key] = previous
+            return
         raise KeyError
 
     def __contains__(self, key: GridPosition) -> bool:
@@ -138,20 +797,26 @@ class Grid(MutableMapping):
         return len(self._grid)
 
     def __iter__(self) -> Iterator:
-        return KeysView(self._grid)
+        return iter(self._grid)
 
     def __eq__(self, other: Grid) -> bool:
+        self._widen()
+        other._widen()
         if any([getattr(self, p) != getattr(other, p) for p in self._properties]):
             return False
 
         if len(self._grid) != len(other._grid):
             return False
 
-        return all([v == other._grid[k] for k, v in self._grid.items()])
+        if isinstance(self._grid, DenseStore) and isinstance(other._grid, DenseStore):
+            return self._grid == other._grid
+
+        return all(k in other._grid and v == other._grid[k] for k, v in self._grid.items())
 
     def __str__(self) -> str:
         rows = reversed(self.row_range) if self._origin == 'll' else self.row_range
-        lines = [f'{r:3d}: {self.render_row(r)}' for r in rows]
+        render = self._renderer()
+        lines = [f'{r:3d}: {render(r)}' for r in rows]
         return '\n'.join(lines)
 
     def keys(self):
@@ -161,57 +826,1044 @@ class Grid(MutableMapping):
         return ValuesView(self._grid)
 
     def items(self):
-        return ItemsView(self._grid)
+        return self._grid.items()
 
     def clear(self) -> None:
+        if self._readonly:
+            self._reject()
+        if self._changes is not None:
+            for key, value in self._grid.items():
+                self._changes.setdefault(key, value)
+        if self._shared:
+            self._unshare(keep=False)
         self._grid.clear()
+        self._adjacency.clear()
+        if self._fingerprint is not None:
+            self._fingerprint = 0
+
+    @property
+    def fingerprint(self) -> int:
+        """A 64-bit Zobrist hash of the grid's cells
+
+        The first read hashes every cell; from then on each change updates it
+        in O(1), so spotting a repeated state costs one int comparison.
+        Equal cells give equal fingerprints; different cells almost never do.
+        """
+        if self._fingerprint is None:
+            fingerprint = 0
+            for key, value in self._grid.items():
+                fingerprint ^= _zobrist(key, value)
+            self._fingerprint = fingerprint
+        return self._fingerprint
+
+    # Dynamic grids fold pending writes into their bounds when the bounds are read
 
     @property
     def rows(self) -> int:
+        self._widen()
         return self._rows
 
     @property
     def cols(self) -> int:
+        self._widen()
         return self._cols
 
     @property
     def center(self) -> GridPosition:
         if self._dynamic:
+            self._widen()
             row = (self._max_row - self._min_row) // 2 + self._min_row
             col = (self._max_col - self._min_col) // 2 + self._min_col
         else:
             row = self.rows // 2 + self._offset
             col = self.cols // 2 + self._offset
-        return GridPosition(row, col)
+        return self.position(row, col)
 
     @property
     def row_range(self) -> range:
         if self._dynamic:
+            self._widen()
             return range(self._min_row, self._max_row+1)
         return range(self._offset, self._rows + self._offset)
 
     @property
     def col_range(self) -> range:
         if self._dynamic:
+            self._widen()
             return range(self._min_col, self._max_col+1)
         return range(self._offset, self._cols+self._offset)
 
     @property
     def lines(self) -> list[str]:
-        return [self.render_row(r) for r in self.row_range]
+        render = self._renderer()
+        return [render(r) for r in self.row_range]
 
     def render(self, value: Any) -> str:
         return ' ' if value is None else str(value)[0]
 
-    def render_row(self, row: int) -> str:
-            return ''.join([self.render(v) for v in self.row(row)])
+    def render_row(self, row: int, layers: Iterable[str] = ()) -> str:
+        """Draw a row, with the named layers' set cells drawn over it (the last on top)"""
+        return self._renderer(layers)(row)
+
+    def _renderer(self, layers: Iterable[str] = ()) -> Callable[[int], str]:
+        """A function that draws one row
+
+        A dense grid renders each palette entry once, then converts a row's
+        codes in bulk: with `bytes.translate` when every entry draws as one
+        byte, otherwise with `str.translate`.
+        """
+        store = self._grid
+        if isinstance(store, DenseStore) and store.typecode == 'B':
+            chars = [self.render(value) for value in store._palette]
+            codes, width, row0 = store._codes, store._cols, store._row0
+            if all(len(ch) == 1 and ord(ch) < 256 for ch in chars):
+                table = bytes(map(ord, chars)) + bytes(256 - len(chars))
+                def draw(row):
+                    start = (row - row0) * width
+                    return bytes(codes[start:start + width]).translate(table).decode('latin-1')
+            else:
+                table = str.maketrans(dict(enumerate(chars)))
+                def draw(row):
+                    start = (row - row0) * width
+                    return str(codes[start:start + width], 'latin-1').translate(table)
+        else:
+            def draw(row):
+                return ''.join([self.render(v) for v in self.row(row)])
+
+        layers = [self._layers[name] for name in layers]
+        if not layers:
+            return draw
+
+        def overlaid(row):
+            cells = list(draw(row))
+            for layer in layers:
+                layer.draw(row, cells)
+            return ''.join(cells)
+        return overlaid
+
+    def write(self, file: IO, layers: Iterable[str] = (), numbered: bool = False) -> None:
+        """Stream the grid to an open text or binary file, a row at a time
+
+        Rows are drawn as by `render_row` (with the named layers over them),
+        top row first, and optionally numbered as by `str`. Binary files get
+        UTF-8. Only one row is held in memory at a time.
+        """
+        binary = isinstance(file, (io.RawIOBase, io.BufferedIOBase))
+        render = self._renderer(layers)
+        rows = reversed(self.row_range) if self._origin == 'll' else self.row_range
+        for r in rows:
+            line = f'{r:3d}: {render(r)}\n' if numbered else f'{render(r)}\n'
+            file.write(line.encode('utf-8') if binary else line)
+
+    # ----- Change tracking -----------------------------------------------------
+
+    def checkpoint(self) -> None:
+        """Start (or restart) recording which cells change
+
+        Once tracking, each write records the cell's value at the checkpoint
+        the first time the cell changes, costing a dict lookup per write.
+        """
+        self._changes = {}
+
+    def untrack(self) -> None:
+        """Stop recording changes"""
+        self._changes = None
+
+    @property
+    def changes(self) -> dict[GridPosition, Any]:
+        """The cells that differ from the last checkpoint, with their values then
+
+        Cells that were empty at the checkpoint map to the grid's default.
+        """
+        if self._changes is None:
+            raise ValueError('Not tracking changes: call checkpoint() first')
+        cells, default = self._grid, self._default
+        return {key: value for key, value in self._changes.items() if cells.get(key, default) != value}
+
+    def changed_rows(self) -> set[int]:
+        return set(map(self.position_row, self.changes))
+
+    def changed_cols(self) -> set[int]:
+        return set(map(self.position_col, self.changes))
+
+    def changed_row_mask(self) -> int:
+        """The changed rows as a bitmask: bit i is row_range[i]"""
+        start = self.row_range.start
+        return sum(1 << (row - start) for row in self.changed_rows())
+
+    def changed_col_mask(self) -> int:
+        """The changed columns as a bitmask: bit i is col_range[i]"""
+        start = self.col_range.start
+        return sum(1 << (col - start) for col in self.changed_cols())
+
+    # ----- Layers --------------------------------------------------------------
+
+    def layer(self, name: str, kind: str = 'byte', symbols: str | Mapping[int, str] = '*') -> Layer | BitLayer:
+        """The named overlay layer, which is made (with kind and symbols) on first use
+
+        Layers annotate cells without touching the grid's own values: a
+        'byte' or 'int' layer keeps one compact array entry per cell, and a
+        'bit' layer one bit. They cover the grid's bounds when made, and are
+        made afresh if the bounds have changed since.
+        """
+        layer = self._layers.get(name)
+        if layer is None or layer.bounds != (self.row_range, self.col_range):
+            if kind == 'bit':
+                layer = BitLayer(self.row_range, self.col_range, positions=self._positions, symbols=symbols)
+            else:
+                layer = Layer(self, kind, symbols)
+            self._layers[name] = layer
+        return layer
+
+    def drop_layer(self, name: str) -> None:
+        self._layers.pop(name, None)
 
     def row(self, r: int) -> list[Any]:
-        return [self[GridPosition(r, c)] for c in self.col_range]
+        if isinstance(self._grid, DenseStore):
+            return self._grid.row(r)
+        return [self[self.position(r, c)] for c in self.col_range]
 
     def col(self, c: int) -> list[Any]:
-        return [self[GridPosition(r, c)] for r in self.row_range]
+        if isinstance(self._grid, DenseStore):
+            return self._grid.col(c)
+        return [self[self.position(r, c)] for r in self.row_range]
 
     def inbounds(self, position: GridPosition) -> bool:
-        return (GridRow(position) in self.row_range and
-                GridCol(position) in self.col_range)
+        if self._dynamic:
+            self._widen()
+            return (self._min_row <= self.position_row(position) <= self._max_row and
+                    self._min_col <= self.position_col(position) <= self._max_col)
+        return (0 <= self.position_row(position) - self._offset < self._rows and
+                0 <= self.position_col(position) - self._offset < self._cols)
+
+    # ----- Neighbors -----------------------------------------------------------
+
+    def adjacency(self, diagonal: bool = False, passable: Callable[[Any], bool] = None) -> Adjacency:
+        """The (cached) neighbor tables for every cell within the grid's bounds
+
+        With a passable predicate only cells whose values pass are linked.
+        Tables are cached by (diagonal, passable), so pass the same predicate
+        (a function, not a fresh lambda) to reuse one. Writes through the grid
+        drop every cached table, and only the latest few are kept.
+        """
+        key = (diagonal, passable)
+        table = self._adjacency.get(key)
+        if table is None or table.bounds != (self.row_range, self.col_range):
+            table = Adjacency(self, diagonal, passable)
+            self._adjacency.pop(key, None)
+            if len(self._adjacency) >= _ADJACENCY_LIMIT:
+                del self._adjacency[next(iter(self._adjacency))]
+            self._adjacency[key] = table
+        return table
+
+    def invalidate(self) -> None:
+        """Forget cached neighbor tables, after changing cells behind the grid's back (say via `codes`)"""
+        self._adjacency.clear()
+
+    # ----- Traversal -----------------------------------------------------------
+
+    # Breadth-first searches run over the cell numbers of an adjacency table.
+    # Cells are marked when they are queued, so each is queued at most once.
+    # Sources may be one position or an iterable of them (multi-source BFS).
+
+    def _sources(self, table: Adjacency, sources: GridPosition | Iterable[GridPosition]) -> list[int]:
+        if isinstance(sources, self._key_type):
+            sources = [sources]
+        indexes = []
+        for source in sources:
+            i = table.index(source)
+            if i < 0:
+                raise IndexError(source)
+            indexes.append(i)
+        return indexes
+
+    def distances(self, sources: GridPosition | Iterable[GridPosition], passable: Callable[[Any], bool] = None,
+                  diagonal: bool = False, limit: int = None) -> array:
+        """The number of steps from the nearest source to every cell
+
+        The result is indexed by cell number, as in `adjacency(diagonal,
+        passable)`, and holds -1 for cells that can't be reached in limit steps.
+        """
+        table = self.adjacency(diagonal, passable)
+        offsets, targets = table.offsets, table.targets
+        distance = array('l', [-1]) * len(table)
+
+        queue = deque()
+        for i in self._sources(table, sources):
+            if distance[i] < 0:
+                distance[i] = 0
+                queue.append(i)
+
+        while queue:
+            i = queue.popleft()
+            d = distance[i] + 1
+            if limit is not None and d > limit:
+                break
+            for j in targets[offsets[i]:offsets[i+1]]:
+                if distance[j] < 0:
+                    distance[j] = d
+                    queue.append(j)
+
+        return distance
+
+    def bfs(self, sources: GridPosition | Iterable[GridPosition], passable: Callable[[Any], bool] = None,
+            diagonal: bool = False) -> Iterator[tuple[GridPosition, int]]:
+        """Yield (position, distance) for every reachable cell, nearest first"""
+        table = self.adjacency(diagonal, passable)
+        offsets, targets, positions = table.offsets, table.targets, table.positions
+        seen = bytearray(len(table))
+
+        queue = deque()
+        for i in self._sources(table, sources):
+            if not seen[i]:
+                seen[i] = 1
+                queue.append((i, 0))
+
+        while queue:
+            i, d = queue.popleft()
+            yield positions[i], d
+            for j in targets[offsets[i]:offsets[i+1]]:
+                if not seen[j]:
+                    seen[j] = 1
+                    queue.append((j, d + 1))
+
+    def flood(self, sources: GridPosition | Iterable[GridPosition], passable: Callable[[Any], bool] = None,
+              diagonal: bool = False) -> set[GridPosition]:
+        """The positions of every cell reachable from the sources"""
+        positions = self.adjacency(diagonal, passable).positions
+        return {positions[i] for i, d in enumerate(self.distances(sources, passable, diagonal)) if d >= 0}
+
+    def components(self, key: Callable[[Any], Any] = None, diagonal: bool = False) -> Components:
+        """Label the connected regions of cells with equal keys
+
+        A cell's key is key(value), or the value itself; cells whose key is
+        None are background. Two passes over the rows: the first gives each
+        cell the label of a matching neighbor above or to its left, merging
+        labels that meet in a union-find with path compression and union by
+        rank; the second resolves and renumbers the labels, counting sizes
+        and bounding boxes. Nothing recurses, so any size of grid is fine.
+        """
+        rows, cols = self.row_range, self.col_range
+        width, count = len(cols), len(rows) * len(cols)
+        cells, default, position = self._grid, self._default, self.position
+        values = [cells.get(position(r, c), default) for r in rows for c in cols]
+        keys = list(map(key, values)) if key else values
+
+        parent = array('l', [0])
+        rank = bytearray(1)
+
+        def find(label: int) -> int:
+            root = label
+            while parent[root] != root:
+                root = parent[root]
+            while parent[label] != root:
+                parent[label], label = root, parent[label]
+            return root
+
+        def union(a: int, b: int) -> None:
+            a, b = find(a), find(b)
+            if a != b:
+                if rank[a] < rank[b]:
+                    a, b = b, a
+                parent[b] = a
+                if rank[a] == rank[b]:
+                    rank[a] += 1
+
+        # Pass 1: provisional labels from the neighbors already visited
+        labels = array('l', [0]) * count
+        for i, k in enumerate(keys):
+            if k is None:
+                continue
+            c = i % width
+            label = labels[i - 1] if c and keys[i - 1] == k else 0
+
+            if i >= width:
+                above = [i - width]
+                if diagonal:
+                    if c:
+                        above.append(i - width - 1)
+                    if c < width - 1:
+                        above.append(i - width + 1)
+                for j in above:
+                    if keys[j] == k:
+                        if not label:
+                            label = labels[j]
+                        elif labels[j] != label:
+                            union(label, labels[j])
+
+            if not label:
+                label = len(parent)
+                parent.append(label)
+                rank.append(0)
+            labels[i] = label
+
+        # Pass 2: number the roots 1, 2, ... in order of appearance
+        final = array('l', [0]) * len(parent)
+        sizes, boxes, groups = [0], [None], [None]
+        row0, col0 = rows.start, cols.start
+        for i, label in enumerate(labels):
+            if not label:
+                continue
+            root = find(label)
+            n = final[root]
+            r, c = divmod(i, width)
+            r, c = r + row0, c + col0
+            if not n:
+                n = final[root] = len(sizes)
+                sizes.append(0)
+                boxes.append([r, c, r, c])
+                groups.append(keys[i])
+            labels[i] = n
+            sizes[n] += 1
+            box = boxes[n]
+            if c < box[1]:
+                box[1] = c
+            elif c > box[3]:
+                box[3] = c
+            box[2] = r
+
+        return Components(self, labels, sizes, [tuple(box) if box else None for box in boxes], groups)
+
+    # ----- Views ---------------------------------------------------------------
+
+    def _view(self, transform: tuple[int, ...], rows: int, cols: int) -> GridView:
+        return GridView(self, transform, rows, cols)
+
+    def transposed(self) -> GridView:
+        """A view where rows are columns and columns are rows"""
+        return self._view((0, 1, 1, 0, 0, 0), self._cols, self._rows)
+
+    def rotated(self, turns: int = 1) -> GridView:
+        """A view rotated clockwise by quarter turns, as it would print with origin 'ul'"""
+        r, c = self._rows - 1, self._cols - 1
+        turns %= 4
+        if turns == 1:
+            return self._view((0, -1, 1, 0, r, 0), self._cols, self._rows)
+        if turns == 2:
+            return self._view((-1, 0, 0, -1, r, c), self._rows, self._cols)
+        if turns == 3:
+            return self._view((0, 1, -1, 0, 0, c), self._cols, self._rows)
+        return self._view((1, 0, 0, 1, 0, 0), self._rows, self._cols)
+
+    def flipped(self, axis: str = 'rows') -> GridView:
+        """A view with the rows (top to bottom) or the columns (left to right) reversed"""
+        if axis == 'rows':
+            return self._view((-1, 0, 0, 1, self._rows - 1, 0), self._rows, self._cols)
+        if axis == 'cols':
+            return self._view((1, 0, 0, -1, 0, self._cols - 1), self._rows, self._cols)
+        raise ValueError(f'Invalid axis: {axis}')
+
+    def window(self, rows: range, cols: range) -> GridView:
+        """A view of a rectangle of this grid; its top left cell becomes the view's first cell"""
+        r0, c0 = rows.start - self.row_range.start, cols.start - self.col_range.start
+        if r0 < 0 or c0 < 0 or r0 + len(rows) > self._rows or c0 + len(cols) > self._cols:
+            raise IndexError(f'Window {rows}, {cols} is outside of {self!r}')
+        return self._view((1, 0, 0, 1, r0, c0), len(rows), len(cols))
+
+    # ----- NumPy methods (storage='numpy') -----------------------------------
+
+    def _numpy(self) -> NumpyStore:
+        if not isinstance(self._grid, NumpyStore):
+            raise TypeError(f"{self!r} doesn't use numpy storage")
+        return self._grid
+
+    @property
+    def array(self):
+        """The cell values as a (rows, cols) ndarray; index [0, 0] is the first row and column"""
+        return self._numpy().values
+
+    @property
+    def codes(self):
+        """A writable (rows, cols) ndarray view of the cells' palette codes
+
+        Writes through it bypass the grid, so a grid sharing its storage with
+        a copy takes private storage first.
+        """
+        self._numpy()
+        if self._shared:
+            self._unshare()
+        return self._code_array()
+
+    def _code_array(self):
+        """The palette codes as a (rows, cols) ndarray, for reading"""
+        return self._numpy().codes
+
+    def row_array(self, r: int):
+        return self.array[r - self.row_range.start]
+
+    def col_array(self, c: int):
+        return self.array[:, c - self.col_range.start]
+
+    def mask(self, value: Any):
+        """A boolean (rows, cols) ndarray that is True where the cell holds value"""
+        return self._code_array() == self._numpy().code(value)
+
+    def count(self, value: Any) -> int:
+        return int(self.mask(value).sum())
+
+    def total(self, mask=None) -> Any:
+        """Sum the cell values, optionally only where mask is True"""
+        values = self.array
+        return values.sum() if mask is None else values[mask].sum()
+
+    def positions(self, mask) -> list[GridPosition]:
+        """The positions of the cells where mask is True"""
+        rows, cols = self._numpy()._np.nonzero(mask)
+        r0, c0 = self.row_range.start, self.col_range.start
+        return [self.position(r + r0, c + c0) for r, c in zip(rows.tolist(), cols.tolist())]
+
+
+class CompressedGrid(Grid):
+    """A grid over coordinate-compressed rows and columns
+
+    The sorted, distinct row breakpoints split the real rows into bands:
+    compressed row i covers real rows `row_breaks[i]` up to (not including)
+    `row_breaks[i+1]`, and likewise for columns. Each cell stands for a
+    rectangle of `weight(position)` real cells, so a few thousand cells can
+    describe shapes spanning trillions. To give line x a band of its own,
+    include both x and x+1 as breakpoints.
+    """
+
+    def __init__(self, rows: Iterable[int], cols: Iterable[int], **keywords):
+        self.row_breaks: list[int] = sorted(set(rows))
+        self.col_breaks: list[int] = sorted(set(cols))
+        self.heights: list[int] = [b - a for a, b in pairwise(self.row_breaks)]
+        self.widths: list[int] = [b - a for a, b in pairwise(self.col_breaks)]
+        self._row_index = {row: i for i, row in enumerate(self.row_breaks)}
+        self._col_index = {col: i for i, col in enumerate(self.col_breaks)}
+        super().__init__(rows=len(self.heights), cols=len(self.widths), **keywords)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self._rows}, {self._cols}) over {self.total_area:,} cells'
+
+    def compress(self, row: int, col: int) -> GridPosition:
+        """The compressed position of the cell holding a real (row, col)"""
+        r = bisect_right(self.row_breaks, row) - 1
+        c = bisect_right(self.col_breaks, col) - 1
+        if not (0 <= r < self._rows and 0 <= c < self._cols):
+            raise IndexError((row, col))
+        return self.position(r + self._offset, c + self._offset)
+
+    def weight(self, position: GridPosition) -> int:
+        """The number of real cells a compressed cell stands for"""
+        return (self.heights[self.position_row(position) - self._offset] *
+                self.widths[self.position_col(position) - self._offset])
+
+    @property
+    def total_area(self) -> int:
+        return (self.row_breaks[-1] - self.row_breaks[0]) * (self.col_breaks[-1] - self.col_breaks[0])
+
+    def area(self, positions: Iterable[GridPosition] = None) -> int:
+        """The real area of some compressed cells (by default, every stored cell)"""
+        return sum(map(self.weight, self.keys() if positions is None else positions))
+
+    def fill(self, top: int, left: int, bottom: int, right: int, value: Any) -> None:
+        """Set every compressed cell in the real rectangle [top, bottom) x [left, right)
+
+        The rectangle's edges must be breakpoints.
+        """
+        try:
+            rows = range(self._row_index[top], self._row_index[bottom])
+            cols = range(self._col_index[left], self._col_index[right])
+        except KeyError as e:
+            raise ValueError(f'{e.args[0]} is not a breakpoint') from None
+        offset = self._offset
+        self.update((self.position(r + offset, c + offset) for r in rows for c in cols), value)
+
+
+class Components:
+    """The connected regions of a grid, as labeled by `Grid.components`
+
+    `labels` holds each cell's component number by cell number (row-major
+    within the grid's bounds, as for Adjacency), with 0 for background.
+    Components are numbered from 1 in the order their first cells appear,
+    and `sizes[n]`, `boxes[n]` (min row, min col, max row, max col) and
+    `keys[n]` describe component n; index 0 is unused.
+    """
+
+    def __init__(self, grid: Grid, labels: array, sizes: list[int], boxes: list[tuple], keys: list[Any]):
+        self.bounds = (grid.row_range, grid.col_range)
+        self.labels, self.sizes, self.boxes, self.keys = labels, sizes, boxes, keys
+        self._position, self._row, self._col = grid.position, grid.position_row, grid.position_col
+
+    def __repr__(self) -> str:
+        return f'Components({len(self)} over {self.bounds})'
+
+    def __len__(self) -> int:
+        return len(self.sizes) - 1
+
+    def label(self, position: GridPosition) -> int:
+        """The component number of a position; 0 for background and out of bounds"""
+        rows, cols = self.bounds
+        r, c = self._row(position) - rows.start, self._col(position) - cols.start
+        if 0 <= r < len(rows) and 0 <= c < len(cols):
+            return self.labels[r * len(cols) + c]
+        return 0
+
+    def positions(self, label: int) -> list[GridPosition]:
+        """The positions of the cells in one component, searching only its bounding box"""
+        rows, cols = self.bounds
+        top, left, bottom, right = self.boxes[label]
+        width = len(cols)
+        return [self._position(r, c)
+                for r in range(top, bottom + 1)
+                for c in range(left, right + 1)
+                if self.labels[(r - rows.start) * width + c - cols.start] == label]
+
+    def bordered(self, label: int) -> bool:
+        """Whether a component touches the edge of the grid"""
+        rows, cols = self.bounds
+        top, left, bottom, right = self.boxes[label]
+        return top == rows.start or left == cols.start or bottom == rows[-1] or right == cols[-1]
+
+
+class Layer:
+    """A per-cell annotation over a grid's bounds, made by `Grid.layer`
+
+    Values are kept in one array by cell number (row-major within the
+    bounds): unsigned bytes for 'byte' layers and signed 64-bit ints for
+    'int' layers. Zero means unset. When a grid is rendered with the layer,
+    set cells are drawn as `symbols`: one character for every value, or a
+    mapping from value to character.
+    """
+
+    KINDS = {'byte': 'B', 'int': 'q'}
+
+    def __init__(self, grid: Grid, kind: str = 'byte', symbols: str | Mapping[int, str] = '*'):
+        if kind not in self.KINDS:
+            raise ValueError(f'Invalid layer kind: {kind}')
+        rows, cols = grid.row_range, grid.col_range
+        self.bounds = (rows, cols)
+        self.kind = kind
+        self.symbols = symbols
+        self.values = array(self.KINDS[kind], [0]) * (len(rows) * len(cols))
+
+        self._row0, self._col0 = rows.start, cols.start
+        self._rows, self._cols = len(rows), len(cols)
+        self._position, self._row, self._col = grid.position, grid.position_row, grid.position_col
+
+    def __repr__(self) -> str:
+        return f'Layer({self.kind}, {len(self):,} set)'
+
+    def _index(self, position: GridPosition) -> int:
+        r = self._row(position) - self._row0
+        c = self._col(position) - self._col0
+        if 0 <= r < self._rows and 0 <= c < self._cols:
+            return r * self._cols + c
+        raise IndexError(position)
+
+    def __getitem__(self, position: GridPosition) -> int:
+        return self.values[self._index(position)]
+
+    def __setitem__(self, position: GridPosition, value: int) -> None:
+        self.values[self._index(position)] = value
+
+    def __contains__(self, position: GridPosition) -> bool:
+        try:
+            return self.values[self._index(position)] != 0
+        except IndexError:
+            return False
+
+    def __len__(self) -> int:
+        return len(self.values) - self.values.count(0)
+
+    def __iter__(self) -> Iterator[GridPosition]:
+        for i, value in enumerate(self.values):
+            if value:
+                r, c = divmod(i, self._cols)
+                yield self._position(r + self._row0, c + self._col0)
+
+    def clear(self) -> None:
+        self.values[:] = array(self.values.typecode, [0]) * len(self.values)
+
+    def symbol(self, value: int) -> str:
+        return self.symbols if isinstance(self.symbols, str) else self.symbols.get(value, '?')
+
+    def draw(self, row: int, cells: list[str]) -> None:
+        """Replace the characters of a rendered row where this layer is set"""
+        start = (row - self._row0) * self._cols
+        for c, value in enumerate(self.values[start:start + self._cols]):
+            if value:
+                cells[c] = self.symbol(value)
+
+
+class Adjacency:
+    """Flat neighbor tables for a grid
+
+    Cells within the grid's bounds are numbered row-major from 0. The
+    neighbors of cell i are `targets[offsets[i]:offsets[i+1]]` (a CSR layout),
+    so index-based algorithms never touch a position or check bounds.
+    `adjacency[position]` returns a position's neighbors as positions.
+    """
+
+    ORTHOGONAL = ((1, 0), (0, 1), (-1, 0), (0, -1))
+    DIAGONAL = ORTHOGONAL + ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
+    def __init__(self, grid: Grid, diagonal: bool = False, passable: Callable[[Any], bool] = None):
+        rows, cols = grid.row_range, grid.col_range
+        self.bounds = (rows, cols)
+        self.height, self.width = len(rows), len(cols)
+        self.positions: list[GridPosition] = [grid.position(r, c) for r in rows for c in cols]
+
+        self._row0, self._col0 = rows.start, cols.start
+        self._row, self._col = grid.position_row, grid.position_col
+
+        open = None
+        if passable:
+            cells = grid._grid
+            open = bytearray(passable(cells.get(p, grid._default)) for p in self.positions)
+
+        steps = self.DIAGONAL if diagonal else self.ORTHOGONAL
+        self.offsets = array('l', [0])
+        self.targets = array('l')
+        for i in range(len(self.positions)):
+            if open is None or open[i]:
+                r, c = divmod(i, self.width)
+                for dr, dc in steps:
+                    rr, cc = r + dr, c + dc
+                    if 0 <= rr < self.height and 0 <= cc < self.width:
+                        j = rr * self.width + cc
+                        if open is None or open[j]:
+                            self.targets.append(j)
+            self.offsets.append(len(self.targets))
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __getitem__(self, position: GridPosition) -> list[GridPosition]:
+        i = self.index(position)
+        if i < 0:
+            raise IndexError(position)
+        positions = self.positions
+        return [positions[j] for j in self.targets[self.offsets[i]:self.offsets[i+1]]]
+
+    def index(self, position: GridPosition) -> int:
+        """The cell number of a position, or -1 if it is out of bounds"""
+        r = self._row(position) - self._row0
+        c = self._col(position) - self._col0
+        if 0 <= r < self.height and 0 <= c < self.width:
+            return r * self.width + c
+        return -1
+
+    def neighbors(self, index: int) -> array:
+        """The cell numbers of a cell's neighbors"""
+        return self.targets[self.offsets[index]:self.offsets[index+1]]
+
+
+class BitGrid:
+    """A yes/no layer over a rectangular grid, stored as one Python int per row
+
+    Cell (r, c) is bit `c - cols.start` of `bits[r - rows.start]`. A 140x140
+    layer takes a few kilobytes where a set of positions takes megabytes,
+    and `len` (a popcount), the boolean operators and `shifted` work a whole
+    row at a time. Positions outside the bounds are never members.
+    """
+
+    def __init__(self, rows: range, cols: range, bits: list[int] = None, positions: str = 'complex'):
+        self.row_range: range = rows
+        self.col_range: range = cols
+        self.bits: list[int] = [0] * len(rows) if bits is None else bits
+        self.full: int = (1 << len(cols)) - 1
+
+        self._row0, self._col0 = rows.start, cols.start
+        self._rows, self._cols = len(rows), len(cols)
+        self._positions = positions
+        if positions == 'packed':
+            self.position, self.position_row, self.position_col = PackedPosition, PackedRow, PackedCol
+        else:
+            self.position, self.position_row, self.position_col = GridPosition, GridRow, GridCol
+
+    @classmethod
+    def collect(cls, grid: Grid, predicate: Callable[[Any], bool] = None) -> BitGrid:
+        """The cells of grid holding a value that passes predicate (by default, every stored cell)"""
+        layer = cls(grid.row_range, grid.col_range, positions=grid._positions)
+        for position, value in grid.items():
+            if predicate is None or predicate(value):
+                layer.add(position)
+        return layer
+
+    def __repr__(self) -> str:
+        return f'BitGrid({self.row_range}, {self.col_range}, {len(self):,} set)'
+
+    def __str__(self) -> str:
+        return '\n'.join(''.join('#' if bits >> c & 1 else '.' for c in range(self._cols))
+                         for bits in self.bits)
+
+    def __int__(self) -> int:
+        """The whole layer as one int, row-major with the first row in the low bits"""
+        whole = 0
+        for bits in reversed(self.bits):
+            whole = whole << self._cols | bits
+        return whole
+
+    def __len__(self) -> int:
+        return sum(bits.bit_count() for bits in self.bits)
+
+    def __iter__(self) -> Iterator[GridPosition]:
+        for r, bits in enumerate(self.bits, self._row0):
+            while bits:
+                low = bits & -bits
+                yield self.position(r, low.bit_length() - 1 + self._col0)
+                bits ^= low
+
+    def __contains__(self, position: GridPosition) -> bool:
+        r = self.position_row(position) - self._row0
+        c = self.position_col(position) - self._col0
+        return 0 <= r < self._rows and 0 <= c < self._cols and self.bits[r] >> c & 1 == 1
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, BitGrid):
+            return NotImplemented
+        return self.bounds == other.bounds and self.bits == other.bits
+
+    @property
+    def bounds(self) -> tuple[range, range]:
+        return self.row_range, self.col_range
+
+    def test(self, row: int, col: int) -> bool:
+        r, c = row - self._row0, col - self._col0
+        if not (0 <= r < self._rows and 0 <= c < self._cols):
+            raise IndexError((row, col))
+        return self.bits[r] >> c & 1 == 1
+
+    def set(self, row: int, col: int, on: bool = True) -> None:
+        r, c = row - self._row0, col - self._col0
+        if not (0 <= r < self._rows and 0 <= c < self._cols):
+            raise IndexError((row, col))
+        if on:
+            self.bits[r] |= 1 << c
+        else:
+            self.bits[r] &= ~(1 << c)
+
+    def add(self, position: GridPosition) -> None:
+        self.set(self.position_row(position), self.position_col(position))
+
+    def discard(self, position: GridPosition) -> None:
+        if position in self:
+            self.set(self.position_row(position), self.position_col(position), False)
+
+    def update(self, positions: Iterable[GridPosition]) -> None:
+        bits, row, col = self.bits, self.position_row, self.position_col
+        r0, c0, rows, cols = self._row0, self._col0, self._rows, self._cols
+        for position in positions:
+            r, c = row(position) - r0, col(position) - c0
+            if not (0 <= r < rows and 0 <= c < cols):
+                raise IndexError(position)
+            bits[r] |= 1 << c
+
+    def row(self, row: int) -> int:
+        """The bits of one row, with the first column in bit 0"""
+        if not (0 <= row - self._row0 < self._rows):
+            raise IndexError(row)
+        return self.bits[row - self._row0]
+
+    def copy(self) -> BitGrid:
+        return BitGrid(self.row_range, self.col_range, self.bits.copy(), self._positions)
+
+    def empty(self) -> BitGrid:
+        return BitGrid(self.row_range, self.col_range, None, self._positions)
+
+    def shifted(self, drow: int = 0, dcol: int = 0) -> BitGrid:
+        """Every set cell moved by (drow, dcol); cells moved out of bounds are dropped"""
+        full = self.full
+        if dcol >= 0:
+            rows = [bits << dcol & full for bits in self.bits]
+        else:
+            rows = [bits >> -dcol for bits in self.bits]
+        if drow > 0:
+            rows = [0] * min(drow, self._rows) + rows[:max(self._rows - drow, 0)]
+        elif drow < 0:
+            rows = rows[-drow:] + [0] * min(-drow, self._rows)
+        return BitGrid(self.row_range, self.col_range, rows, self._positions)
+
+    # ----- Boolean operators -------------------------------------------------
+
+    def _other(self, other: BitGrid) -> list[int]:
+        if self.bounds != other.bounds:
+            raise ValueError(f'BitGrid bounds differ: {self.bounds} vs {other.bounds}')
+        return other.bits
+
+    def __and__(self, other: BitGrid) -> BitGrid:
+        bits = [a & b for a, b in zip(self.bits, self._other(other))]
+        return BitGrid(self.row_range, self.col_range, bits, self._positions)
+
+    def __or__(self, other: BitGrid) -> BitGrid:
+        bits = [a | b for a, b in zip(self.bits, self._other(other))]
+        return BitGrid(self.row_range, self.col_range, bits, self._positions)
+
+    def __xor__(self, other: BitGrid) -> BitGrid:
+        bits = [a ^ b for a, b in zip(self.bits, self._other(other))]
+        return BitGrid(self.row_range, self.col_range, bits, self._positions)
+
+    def __sub__(self, other: BitGrid) -> BitGrid:
+        bits = [a & ~b for a, b in zip(self.bits, self._other(other))]
+        return BitGrid(self.row_range, self.col_range, bits, self._positions)
+
+    def __invert__(self) -> BitGrid:
+        bits = [bits ^ self.full for bits in self.bits]
+        return BitGrid(self.row_range, self.col_range, bits, self._positions)
+
+    def __iand__(self, other: BitGrid) -> BitGrid:
+        self.bits = [a & b for a, b in zip(self.bits, self._other(other))]
+        return self
+
+    def __ior__(self, other: BitGrid) -> BitGrid:
+        self.bits = [a | b for a, b in zip(self.bits, self._other(other))]
+        return self
+
+
+class BitLayer(BitGrid):
+    """A yes/no layer made by `Grid.layer(name, 'bit')`: a BitGrid that can be rendered"""
+
+    def __init__(self, rows: range, cols: range, bits: list[int] = None, positions: str = 'complex',
+                 symbols: str = '*'):
+        super().__init__(rows, cols, bits, positions)
+        self.symbols = symbols
+
+    def __getitem__(self, position: GridPosition) -> int:
+        return int(position in self)
+
+    def __setitem__(self, position: GridPosition, value: int) -> None:
+        self.set(self.position_row(position), self.position_col(position), bool(value))
+
+    def clear(self) -> None:
+        self.bits = [0] * self._rows
+
+    def draw(self, row: int, cells: list[str]) -> None:
+        bits = self.row(row)
+        while bits:
+            low = bits & -bits
+            cells[low.bit_length() - 1] = self.symbols
+            bits ^= low
+
+
+class ViewStore(MutableMapping):
+    """Cell storage that maps positions in a GridView onto its base Grid
+
+    Reads go straight to the base grid's storage; writes and deletes go
+    through the base grid itself, so anything it does on a change still happens.
+    """
+
+    def __init__(self, view: GridView):
+        self._view = view
+        self._base = view._base
+        if view._positions == 'complex':
+            self._map = self._map_complex
+
+    def _map(self, key: GridPosition) -> Optional[GridPosition]:
+        view = self._view
+        i = view.position_row(key) - view._offset
+        j = view.position_col(key) - view._offset
+        if not (0 <= i < view._rows and 0 <= j < view._cols):
+            return None
+        a, b, c, d, e, f = view._transform
+        return view.position(a*i + b*j + e + view._base_row, c*i + d*j + f + view._base_col)
+
+    def _map_complex(self, key: GridPosition) -> Optional[GridPosition]:
+        view = self._view
+        i = int(key.real) - view._offset
+        j = int(key.imag) - view._offset
+        if not (0 <= i < view._rows and 0 <= j < view._cols):
+            return None
+        a, b, c, d, e, f = view._transform
+        return GridPosition(a*i + b*j + e + view._base_row, c*i + d*j + f + view._base_col)
+
+    def __getitem__(self, key: GridPosition) -> Any:
+        position = self._map(key)
+        if position is None:
+            raise KeyError(key)
+        return self._base._grid[position]
+
+    def __setitem__(self, key: GridPosition, value: Any) -> None:
+        position = self._map(key)
+        if position is None:
+            raise IndexError(key)
+        self._base[position] = value
+
+    def __delitem__(self, key: GridPosition) -> None:
+        position = self._map(key)
+        if position is None:
+            raise KeyError(key)
+        del self._base[position]
+
+    def __contains__(self, key: GridPosition) -> bool:
+        position = self._map(key)
+        return position is not None and position in self._base._grid
+
+    def __iter__(self) -> Iterator[GridPosition]:
+        view = self._view
+        for r in view.row_range:
+            for c in view.col_range:
+                key = view.position(r, c)
+                if key in self:
+                    yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def copy(self) -> dict:
+        return dict(self.items())
+
+
+class GridView(Grid):
+    """A transposed, rotated, flipped or windowed view of another Grid
+
+    Nothing is copied: each access maps the view's position onto the base
+    grid, and writes change the base grid. `_transform` is the integer affine
+    map (a, b, c, d, e, f) from the view's zero-based (i, j) to the base's:
+    (a*i + b*j + e, c*i + d*j + f). Views of views compose their transforms,
+    so they always map directly onto the original grid.
+
+    Views use the base grid's offset, so a view of a 1-based grid is 1-based.
+    With numpy storage, `codes` and `array` are NumPy views of the base's arrays.
+    """
+
+    def __init__(self, base: Grid, transform: tuple[int, ...], rows: int, cols: int):
+        if base._dynamic:
+            raise ValueError('Views need a grid with a fixed size')
+        super().__init__(rows=rows, cols=cols, offset=base._offset, sparse=base._sparse,
+                         origin=base._origin, default=base._default, positions=base._positions)
+        self._base = base
+        self._base_row = base.row_range.start
+        self._base_col = base.col_range.start
+        self._transform = transform
+        self._grid = ViewStore(self)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self._rows}, {self._cols}) of {self._base!r}'
+
+    def _view(self, transform: tuple[int, ...], rows: int, cols: int) -> GridView:
+        a1, b1, c1, d1, e1, f1 = self._transform
+        a2, b2, c2, d2, e2, f2 = transform
+        composed = (
+            a1*a2 + b1*c2, a1*b2 + b1*d2,
+            c1*a2 + d1*c2, c1*b2 + d1*d2,
+            a1*e2 + b1*f2 + e1, c1*e2 + d1*f2 + f1,
+        )
+        return GridView(self._base, composed, rows, cols)
+
+    def _numpy(self) -> NumpyStore:
+        return self._base._numpy()
+
+    def _project(self, values):
+        """Apply the view's transform to an ndarray of the base grid's cells"""
+        def span(start: int, step: int, count: int) -> slice:
+            stop = start + step * count
+            return slice(start, stop if stop >= 0 else None, step)
+
+        a, b, c, d, e, f = self._transform
+        if a:
+            return values[span(e, a, self._rows), span(f, d, self._cols)]
+        return values[span(e, b, self._cols), span(f, c, self._rows)].T
+
+    @property
+    def array(self):
+        return self._project(self._base.array)
+
+    @property
+    def codes(self):
+        return self._project(self._base.codes)
+
+    def _code_array(self):
+        return self._project(self._base._code_array())
+
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import ast
+import mmap
+import struct
+import sys
+
+from grid import DenseStore, Grid, PackedDenseStore
+
+# A grid file is the magic number and the size of the header, the header
+# itself (a dict, as a Python literal), padding to an 8-byte boundary, and
+# then the grid's palette codes, row-major, one or four bytes per cell.
+
+MAGIC = b'AOCGRID1'
+PREFIX = struct.Struct('<8sI')
+
+
+def _aligned(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def save_grid(grid: Grid, path: str) -> int:
+    """Write a fixed-size grid to path, returning the number of bytes written
+
+    Values are stored once, in the palette, so they must be Python literals
+    (str, int, float, complex, bool, None, or tuples of them).
+    """
+    if grid._dynamic:
+        raise ValueError('Only grids with a fixed size can be saved')
+
+    store = grid._grid
+    if not isinstance(store, DenseStore):
+        dense = PackedDenseStore if grid._positions == 'packed' else DenseStore
+        store = dense.collect(grid.row_range, grid.col_range, store, grid._default)
+
+    header = {
+        'rows': grid.rows,
+        'cols': grid.cols,
+        'offset': grid._offset,
+        'origin': grid._origin,
+        'sparse': grid._sparse,
+        'default': grid._default,
+        'positions': grid._positions,
+        'typecode': store.typecode,
+        'byteorder': sys.byteorder,
+        'count': len(store),
+        'palette': store._palette,
+    }
+    text = repr(header).encode('utf-8')
+    if ast.literal_eval(text.decode('utf-8')) != header:
+        raise ValueError('Grid values must be Python literals to be saved')
+
+    start = _aligned(PREFIX.size + len(text))
+    with open(path, 'wb') as gf:
+        gf.write(PREFIX.pack(MAGIC, len(text)))
+        gf.write(text)
+        gf.write(bytes(start - PREFIX.size - len(text)))
+        gf.write(memoryview(store._codes).cast('B'))
+        return gf.tell()
+
+
+def load_grid(path: str) -> Grid:
+    """Map a saved grid's file into memory and return it as a read-only dense Grid
+
+    Nothing is read beyond the header until cells are used, so loading takes
+    the same time for any size of grid. Writing to the grid raises TypeError,
+    but a copy, `Grid(loaded)`, takes private storage on its first write.
+    """
+    with open(path, 'rb') as gf:
+        mapped = mmap.mmap(gf.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+
+    magic, size = PREFIX.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError(f'{path} is not a grid file')
+    header = ast.literal_eval(bytes(view[PREFIX.size:PREFIX.size + size]).decode('utf-8'))
+    if header['byteorder'] != sys.byteorder and header['typecode'] != 'B':
+        raise ValueError(f'{path} was saved with {header["byteorder"]} endian codes')
+
+    grid = Grid(rows=header['rows'], cols=header['cols'], offset=header['offset'], origin=header['origin'],
+                sparse=header['sparse'], default=header['default'], positions=header['positions'])
+
+    start = _aligned(PREFIX.size + size)
+    itemsize = 1 if header['typecode'] == 'B' else 4
+    codes = view[start:start + grid.rows * grid.cols * itemsize].cast(header['typecode'])
+    store = PackedDenseStore if grid._positions == 'packed' else DenseStore
+    grid._grid = store(grid.row_range, grid.col_range, codes=codes, palette=header['palette'],
+                       count=header['count'])
+    grid._readonly = True
+    return grid
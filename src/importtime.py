@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import builtins
+import sys
+import time
+
+_original_import = builtins.__import__
+
+_stack: list[int] = []
+_timings: dict[str, tuple[int, int]] = {}
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    _stack.append(0)
+    started = time.perf_counter_ns()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        cumulative = time.perf_counter_ns() - started
+        children = _stack.pop()
+        if _stack:
+            _stack[-1] += cumulative
+        if name not in _timings:
+            _timings[name] = (cumulative - children, cumulative)
+
+
+def install() -> None:
+    """Start timing every module imported from now on"""
+    builtins.__import__ = _timed_import
+
+
+def uninstall() -> None:
+    builtins.__import__ = _original_import
+
+
+def timings() -> dict[str, tuple[float, float]]:
+    """Return {module: (self ms, cumulative ms)} for every module imported while installed"""
+    return {name: (own / 1_000_000, total / 1_000_000) for name, (own, total) in _timings.items()}
+
+
+def report(limit: int = 10) -> list[str]:
+    """Summarize import times, like `python -X importtime`, slowest first"""
+    results = timings()
+    ranked = sorted(results.items(), key=lambda item: item[1][1], reverse=True)
+    total = sum(own for own, _ in results.values())
+
+    lines = [f'{total:10,.3f} ms: imported {len(results)} modules']
+    for name, (own, cumulative) in ranked[:limit]:
+        lines.append(f'{cumulative:10,.3f} ms: import {name} (self {own:,.3f} ms)')
+    return lines
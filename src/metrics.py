@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from typing import Any
+
+
+def _ignore(*args: Any) -> None:
+    pass
+
+
+class Metric:
+    """A named counter or gauge for instrumenting hot paths
+
+    Solutions grab a metric once (usually at module level) and call `add` for
+    counters or `set` for gauges inside their loops. While metrics are
+    disabled both are bound to a do-nothing function, so the only cost left
+    in the loop is the call itself.
+    """
+
+    __slots__ = ('name', 'kind', 'value', 'peak', 'add', 'set')
+
+    def __init__(self, name: str, kind: str, enabled: bool):
+        self.name = name
+        self.kind = kind
+        self.reset()
+        self.bind(enabled)
+
+    def __repr__(self) -> str:
+        return f'{self.name} = {self.value:,}'
+
+    def bind(self, enabled: bool) -> None:
+        self.add = self._add if enabled else _ignore
+        self.set = self._set if enabled else _ignore
+
+    def reset(self) -> None:
+        self.value = 0
+        self.peak = 0
+
+    def _add(self, amount: int = 1) -> None:
+        self.value += amount
+
+    def _set(self, value: int) -> None:
+        self.value = value
+        if value > self.peak:
+            self.peak = value
+
+
+class Metrics:
+    """The registry of every counter and gauge, which the runner reports per phase"""
+
+    def __init__(self):
+        self.enabled = False
+        self._metrics: dict[str, Metric] = {}
+
+    def __iter__(self):
+        return iter(self._metrics.values())
+
+    def _metric(self, name: str, kind: str) -> Metric:
+        if name not in self._metrics:
+            self._metrics[name] = Metric(name, kind, self.enabled)
+        return self._metrics[name]
+
+    def counter(self, name: str) -> Metric:
+        return self._metric(name, 'counter')
+
+    def gauge(self, name: str) -> Metric:
+        return self._metric(name, 'gauge')
+
+    def enable(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        for metric in self:
+            metric.bind(enabled)
+
+    def reset(self) -> None:
+        for metric in self:
+            metric.reset()
+
+    def report(self, elapsed: float) -> list[str]:
+        """Describe every metric touched since the last reset; elapsed is in milliseconds"""
+        lines = []
+        for metric in self:
+            if metric.kind == 'counter' and metric.value:
+                rate = metric.value / elapsed * 1_000 if elapsed else 0
+                lines.append(f'{metric.value:13,}: {metric.name} ({rate:,.0f}/s)')
+            elif metric.kind == 'gauge' and metric.peak:
+                lines.append(f'{metric.value:13,}: {metric.name} (peak {metric.peak:,})')
+        return lines
+
+
+METRICS = Metrics()
+
+
+def counter(name: str) -> Metric:
+    return METRICS.counter(name)
+
+
+def gauge(name: str) -> Metric:
+    return METRICS.gauge(name)
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import os
+import signal
+
+from collections import Counter
+from types import CodeType, FrameType
+
+
+class Sampler:
+    """A statistical profiler that samples the Python stack on a CPU timer
+
+    Every `interval` seconds of CPU time, SIGPROF interrupts the main thread
+    and the handler records the chain of code objects that was running.
+    Frames are only formatted when the samples are written, so each sample
+    costs a short walk up the stack. With the default 5 ms interval that
+    keeps the overhead to a fraction of a percent.
+
+    The output is in the "collapsed stack" format understood by flamegraph.pl,
+    speedscope and friends: one `outer;...;inner count` line per stack.
+    Requires a platform with `signal.setitimer` (i.e. not Windows).
+    """
+
+    def __init__(self, interval: float = 0.005):
+        if not hasattr(signal, 'setitimer'):
+            raise RuntimeError('Sampling needs signal.setitimer, which this platform lacks')
+
+        self.interval = interval
+        self.samples: Counter[tuple[CodeType, ...]] = Counter()
+        self._previous = None
+
+    def __enter__(self) -> Sampler:
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def __len__(self) -> int:
+        return sum(self.samples.values())
+
+    def _sample(self, signum: int, frame: FrameType) -> None:
+        stack = []
+        while frame is not None:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+        self.samples[tuple(stack)] += 1
+
+    def start(self) -> None:
+        self.samples.clear()
+        self._previous = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self) -> None:
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous or signal.SIG_DFL)
+
+    @staticmethod
+    def label(code: CodeType) -> str:
+        return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+    def collapsed(self) -> list[str]:
+        """Return the samples as collapsed stacks, outermost frame first"""
+        labels: dict[CodeType, str] = {}
+        lines = []
+        for stack, count in self.samples.most_common():
+            names = [labels.setdefault(code, self.label(code)) for code in reversed(stack)]
+            lines.append(f'{";".join(names)} {count}')
+        return lines
+
+    def write(self, path: str) -> None:
+        with open(path, 'w') as cf:
+            for line in self.collapsed():
+                cf.write(line)
+                cf.write('\n')
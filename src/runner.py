@@ -4,11 +4,12 @@ import os
 import sys
 import time
 
+from io import IOBase
 from math import isnan, nan
-from typing import (
-    IO,
-    Optional,
-)
+
+import importtime
+from metrics import METRICS
+from profiler import Sampler
 
 IGNORE = nan
 
@@ -33,6 +34,10 @@ class Puzzle:
         self._elapsed = 0
         self._overall = 0
 
+        self._phase = None
+        self._profile: set[str] = set()
+        self._sampler: Sampler = None
+
     def __repr__(self) -> str:
         text = self.__class__.__name__.replace('Day', 'Day ')
         if self.__doc__:
@@ -55,7 +60,7 @@ class Puzzle:
 
     # ----- Useful methods for parsing data files -----------------------------
 
-    def open(self, filename: str, mode: str = 'r') -> IO:
+    def open(self, filename: str, mode: str = 'r') -> IOBase:
         return open(os.path.join(self.base, filename), mode)
 
     def read_blob(self, filename: str) -> str:
@@ -102,29 +107,42 @@ class Puzzle:
     # ----- Test runner -------------------------------------------------------
 
     def run(self,
-            test1: Optional[PuzzleResult] = None,
-            test2: Optional[PuzzleResult] = None,
+            test1: PuzzleResult | None = None,
+            test2: PuzzleResult | None = None,
             **keywords: dict,) -> None:
         """Load data and run tests"""
 
         print(f'===== {self} =====')
 
         self.testonly = keywords.get('testonly', False)
+        imports = keywords.get('imports', False)
+        if imports:
+            importtime.install()
+        METRICS.enable(keywords.get('metrics', METRICS.enabled))
+
+        profile = keywords.get('profile', False)
+        if profile is True:
+            profile = ['parse', 'part1', 'part2']
+        elif isinstance(profile, str):
+            profile = [profile]
+        self._profile = set(profile or [])
 
         try:
             if self.check_data_files():
                 return
 
-            self.start()
+            self.currentfile = self.testfiles[0]
+            self.start('parse')
             self.tests = [self.parse_data(tf) for tf in self.testfiles]
             self.stop()
-            print(f'{self.elapsed_}: parsed test data')
+            self.log('parsed test data')
 
             if not self.testonly:
-                self.start()
+                self.currentfile = self.datafile
+                self.start('parse')
                 self.data = self.parse_data(self.datafile)
                 self.stop()
-                print(f'{self.elapsed_}: parsed real data')
+                self.log('parsed real data')
 
             skip = keywords.get('skip', False)
 
@@ -160,9 +178,26 @@ class Puzzle:
 
             print(f'{self.overall_}: total')
 
+            if imports:
+                self.import_report()
+
         except NotImplementedError as e:
             print(f'{self.__class__.__name__}: {" ".join(e.args)} not implemented.')
 
+        finally:
+            # A phase that raised never reached stop(): disarm its timer
+            if self._sampler is not None:
+                self._sampler.stop()
+                self._sampler = None
+            if imports:
+                importtime.uninstall()
+
+    def import_report(self) -> None:
+        """Print how long the modules first imported during the run took to load"""
+        importtime.uninstall()
+        for line in importtime.report():
+            print(line)
+
     def check_data_files(self):
         filenames = [self.datafile]
         filenames.extend(self.testfiles)
@@ -188,19 +223,19 @@ class Puzzle:
         method = getattr(self, name)
 
         if expected is not None and not isnan(expected):
-            self.start()
+            self.start(name)
             self.currentfile = self.testfiles[test_index]
             test_result = method(self.tests[test_index])
             self.stop()
-            print(f'{self.elapsed_}: {name} test = {test_result}')
+            self.log(f'{name} test = {test_result}')
             assert test_result == expected, f'Was {test_result}, should have been {expected}'
 
         if not self.testonly:
-            self.start()
+            self.start(name)
             self.currentfile = self.datafile
             real_result = method(self.data)
             self.stop()
-            print(f'{self.elapsed_}: {name} real = {real_result}')
+            self.log(f'{name} real = {real_result}')
 
     def multi_test(self, name: str, expectations: list, testdata: list, multifile: bool) -> None:
         """Execute multiple test runs and one real run for part1 or part2"""
@@ -209,52 +244,71 @@ class Puzzle:
 
         for i, (test, expected) in enumerate(zip(testdata, expectations), 1):
             if expected is not None and not isnan(expected):
-                self.start()
+                self.start(name)
                 self.currentfile = self.testfiles[i-1]
                 result = method(test)
                 self.stop()
                 passed = 'passed' if result == expected else 'failed'
-                print(
-                    f'{self.elapsed_}: {name} test {i}, {expected} == {result} => {passed}')
+                self.log(f'{name} test {i}, {expected} == {result} => {passed}')
 
         if not self.testonly:
-            self.start()
+            self.start(name)
             self.currentfile = self.datafile
             real_result = method(
                 self.data) if multifile else method(self.data[0])
             self.stop()
-            print(f'{self.elapsed_}: {name} real = {real_result}')
+            self.log(f'{name} real = {real_result}')
 
     def map_test(self, name: str, **keywords: dict) -> None:
         """Execute one test run and one real run for part1 or part2"""
 
         method = getattr(self, name)
         expected = keywords.get('expected')
-        self.start()
+        self.start(name)
         self.currentfile = self.testfiles[0]
         test_result = method(self.tests[0], keywords.get('test', None))
         self.stop()
-        print(f'{self.elapsed_}: {name} test = {test_result}')
+        self.log(f'{name} test = {test_result}')
         if not isnan(expected):
             assert test_result == expected, f'Was {test_result}, should have been {expected}'
 
         if not self.testonly:
-            self.start()
+            self.start(name)
             self.currentfile = self.datafile
             real_result = method(self.data, keywords.get('real', None))
             self.stop()
-            print(f'{self.elapsed_}: {name} real = {real_result}')
+            self.log(f'{name} real = {real_result}')
 
     # ----- Internal methods --------------------------------------------------
 
-    def start(self):
-        """Start a timer"""
+    def log(self, message: str) -> None:
+        """Print the elapsed time of a phase, followed by its metrics and profile"""
+        print(f'{self.elapsed_}: {message}')
+        if METRICS.enabled:
+            for line in METRICS.report(self._elapsed):
+                print(line)
+
+        if self._sampler is not None:
+            path = self.current_path(f'.{self._phase}.collapsed')
+            self._sampler.write(path)
+            print(f'{len(self._sampler):13,}: samples written to {os.path.relpath(path)}')
+            self._sampler = None
+
+    def start(self, phase: str = None):
+        """Start a timer, and the sampling profiler if this phase is being profiled"""
+        METRICS.reset()
+        self._phase = phase
+        if phase in self._profile:
+            self._sampler = Sampler()
+            self._sampler.start()
         self._started = time.perf_counter_ns()
 
     def stop(self):
         """Stop the timer and save the elapsed time in milliseconds"""
         self._elapsed = (time.perf_counter_ns() - self._started) / 1_000_000
         self._overall += self._elapsed
+        if self._sampler is not None:
+            self._sampler.stop()
 
     @property
     def elapsed_(self):
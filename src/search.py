@@ -1,7 +1,126 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Any
+from typing import Any, Hashable, Iterable, Iterator, Optional
+
+from metrics import counter
+
+EXPANDED = counter('astar.expanded')
+
+
+class IndexedHeap:
+    """A binary min-heap of hashable items, with an index of where each one is
+
+    The index gives O(1) membership and priority lookups, and lets `push`
+    move an item that is already queued instead of adding it again, so
+    push, pop and decrease-key are all O(log n). Items with equal priority
+    come out in no particular order.
+    """
+
+    def __init__(self):
+        self._items: list[Hashable] = []
+        self._priorities: list[float] = []
+        self._index: dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __bool__(self) -> bool:
+        return bool(self._items)
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self._index
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._items)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({len(self)} items)'
+
+    def priority(self, item: Hashable) -> float:
+        return self._priorities[self._index[item]]
+
+    def peek(self) -> tuple[Hashable, float]:
+        return self._items[0], self._priorities[0]
+
+    def push(self, item: Hashable, priority: float) -> bool:
+        """Queue an item, or move a queued one to a new priority
+
+        Returns False (and leaves the item alone) if it is already queued at
+        a priority no greater than this one.
+        """
+        i = self._index.get(item)
+        if i is None:
+            i = len(self._items)
+            self._items.append(item)
+            self._priorities.append(priority)
+            self._index[item] = i
+            self._up(i)
+        elif priority < self._priorities[i]:
+            self._priorities[i] = priority
+            self._up(i)
+        else:
+            return False
+        return True
+
+    def pop(self) -> tuple[Hashable, float]:
+        """Remove and return the item with the lowest priority, and its priority"""
+        items, priorities = self._items, self._priorities
+        item, priority = items[0], priorities[0]
+        del self._index[item]
+        last, last_priority = items.pop(), priorities.pop()
+        if items:
+            items[0], priorities[0] = last, last_priority
+            self._index[last] = 0
+            self._down(0)
+        return item, priority
+
+    def discard(self, item: Hashable) -> None:
+        """Remove an item if it is queued"""
+        i = self._index.pop(item, None)
+        if i is None:
+            return
+        items, priorities = self._items, self._priorities
+        last, last_priority = items.pop(), priorities.pop()
+        if i < len(items):
+            items[i], priorities[i] = last, last_priority
+            self._index[last] = i
+            self._down(self._up(i))
+
+    def _up(self, i: int) -> int:
+        items, priorities, index = self._items, self._priorities, self._index
+        item, priority = items[i], priorities[i]
+        while i:
+            parent = (i - 1) >> 1
+            if priorities[parent] <= priority:
+                break
+            items[i] = items[parent]
+            priorities[i] = priorities[parent]
+            index[items[i]] = i
+            i = parent
+        items[i], priorities[i] = item, priority
+        index[item] = i
+        return i
+
+    def _down(self, i: int) -> int:
+        items, priorities, index = self._items, self._priorities, self._index
+        item, priority = items[i], priorities[i]
+        size = len(items)
+        while True:
+            child = 2 * i + 1
+            if child >= size:
+                break
+            if child + 1 < size and priorities[child + 1] < priorities[child]:
+                child += 1
+            if priority <= priorities[child]:
+                break
+            items[i] = items[child]
+            priorities[i] = priorities[child]
+            index[items[i]] = i
+            i = child
+        items[i], priorities[i] = item, priority
+        index[item] = i
+        return i
 
 
 @dataclass(order=True, unsafe_hash=True)
@@ -72,35 +191,93 @@ class AstarSearch:
         raise NotImplementedError('heuristic function')
 
     def traverse(self, origin: Any, target: Any) -> list[Any]:
-        from collections import defaultdict
-        from heapq import heappop, heappush
-
         self._clear()
 
-        a_origin = self._find(origin)
-        a_target = self._find(target)
-
-        exploring: list[AstarNode] = []
-        heappush(exploring, a_origin)
+        # The queue and the scores are keyed on the nodes themselves, which
+        # hash faster than their AstarNode wrappers.
+        exploring = IndexedHeap()
+        exploring.push(origin, 0)
+        self._find(origin).priority = 0
 
-        g_score: dict[AstarNode, int] = defaultdict(lambda: self.UNSEEN)
-        g_score[a_origin] = 0
+        g_score: dict[Any, float] = {origin: 0}
 
-        while len(exploring):
-            current = heappop(exploring)
-            if current == a_target:
+        while exploring:
+            node, _ = exploring.pop()
+            EXPANDED.add()
+            current = self._find(node)
+            if node == target:
                 return self._reconstruct_path(current)
 
-            for node in self.neighbors(current.node):
-                neighbor = self._find(node)
-                tentative = g_score[current] + \
-                    self.distance(current.node, neighbor.node)
-                if tentative < g_score[neighbor]:
+            score = g_score[node]
+            for next_node in self.neighbors(node):
+                tentative = score + self.distance(node, next_node)
+                if tentative < g_score.get(next_node, self.UNSEEN):
+                    neighbor = self._find(next_node)
                     neighbor.backtrack = current
-                    g_score[neighbor] = tentative
-                    neighbor.priority = tentative + \
-                        self.heuristic(neighbor.node)
-                    if neighbor not in exploring:
-                        heappush(exploring, neighbor)
+                    g_score[next_node] = tentative
+                    neighbor.priority = tentative + self.heuristic(next_node)
+                    exploring.push(next_node, neighbor.priority)
+
+        return None
+
+
+class StateSearch:
+    """Dijkstra / A* search over composite states, with a goal predicate
+
+    Use this when the moves allowed from a place depend on how it was
+    reached (such as a heading, or how far it has come in a straight line):
+    fold that into the state, so each state is searched once, instead of
+    reading it back from the path. States must be hashable, and search
+    fastest as small ints or tuples of them.
+
+    Subclass this and implement `state_neighbors` and `is_goal`; override
+    `heuristic` (which must never overestimate) to turn Dijkstra into A*.
+    Call `search` with the start states to get the cost and the states of
+    a cheapest path to any goal.
+    """
+
+    def state_neighbors(self, state: Any) -> Iterable[tuple[Any, float]]:
+        """Return (state, cost of the move to it) for every move from a state"""
+        raise NotImplementedError('state_neighbors function')
+
+    def is_goal(self, state: Any) -> bool:
+        raise NotImplementedError('is_goal function')
+
+    def heuristic(self, state: Any) -> float:
+        """Estimate the cost to get to a goal from a state"""
+        return 0
+
+    def search(self, *starts: Any) -> Optional[tuple[float, list[Any]]]:
+        exploring = IndexedHeap()
+        g_score: dict[Any, float] = {}
+        self._came_from: dict[Any, Any] = {}
+        for state in starts:
+            g_score[state] = 0
+            self._came_from[state] = None
+            exploring.push(state, self.heuristic(state))
+
+        while exploring:
+            state, _ = exploring.pop()
+            EXPANDED.add()
+            if self.is_goal(state):
+                return g_score[state], self._reconstruct_path(state)
+
+            score = g_score[state]
+            for next_state, cost in self.state_neighbors(state):
+                tentative = score + cost
+                if next_state not in g_score or tentative < g_score[next_state]:
+                    g_score[next_state] = tentative
+                    self._came_from[next_state] = state
+                    exploring.push(next_state, tentative + self.heuristic(next_state))
 
         return None
+
+    def _reconstruct_path(self, state: Any) -> list[Any]:
+        path = []
+        while state is not None:
+            path.append(state)
+            state = self._came_from[state]
+
+        path.reverse()
+
+        return path
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import mmap
+import os
+
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+from grid import DenseStore, Grid, PackedDenseStore
+
+
+def _shm_open(name: str) -> int:
+    """Open an existing POSIX shared memory block read-only, returning its fd
+
+    `_posixshmem` is the CPython internal module that `SharedMemory` itself
+    uses; other implementations (or a CPython without it) fall back to the
+    /dev/shm file that backs the block on Linux.
+    """
+    try:
+        from _posixshmem import shm_open
+    except ImportError:
+        return os.open(os.path.join('/dev/shm', name), os.O_RDONLY)
+    return shm_open(f'/{name}', os.O_RDONLY, mode=0o600)
+
+
+def _attach(name: str, size: int) -> memoryview:
+    """Map an existing block read-only
+
+    This bypasses `SharedMemory` so that attaching neither registers the block
+    with the worker's resource tracker nor ties its lifetime to a close() call;
+    the mapping goes away when the last view of it does.
+    """
+    if os.name == 'nt':
+        block = mmap.mmap(-1, size, tagname=name, access=mmap.ACCESS_READ)
+    else:
+        fd = _shm_open(name)
+        try:
+            block = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+    return memoryview(block)
+
+
+class SharedHandle:
+    """A picklable reference to parsed data that lives in a shared memory block
+
+    The process that creates a handle owns the block, and must `release` it
+    (or use the handle as a context manager) once the workers are done.
+    Workers receive the handle (which pickles to a few hundred bytes) and
+    call `attach` to get a read-only view of the data without copying it.
+    """
+
+    def __init__(self, payload: bytes | bytearray):
+        self._shm = SharedMemory(create=True, size=max(1, len(payload)))
+        self._shm.buf[:len(payload)] = payload
+        self.name = self._shm.name
+        self.size = len(payload)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['_shm'] = None
+        return state
+
+    def __enter__(self) -> SharedHandle:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.release()
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self.name}, {self.size:,} bytes)'
+
+    def buffer(self) -> memoryview:
+        return _attach(self.name, max(1, self.size))[:self.size]
+
+    def attach(self) -> Any:
+        raise NotImplementedError('attach')
+
+    def release(self) -> None:
+        """Free the shared memory block (owner only)"""
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+class SharedRows(SharedHandle):
+    """Share a rectangular list of byte rows, such as `Puzzle.read_bytearrays` returns"""
+
+    def __init__(self, rows: list[bytes | bytearray]):
+        self.rows = len(rows)
+        self.cols = len(rows[0]) if rows else 0
+        if any(len(row) != self.cols for row in rows):
+            raise ValueError('Rows must all be the same length')
+        super().__init__(b''.join(rows))
+
+    def attach(self) -> list[memoryview]:
+        """Return one read-only memoryview per row"""
+        buffer = self.buffer()
+        return [buffer[r*self.cols:(r+1)*self.cols] for r in range(self.rows)]
+
+
+class SharedGrid(SharedHandle):
+    """Share a Grid (or Grid subclass) as its palette coded DenseStore cells
+
+    Grids with another storage engine are converted first, which requires
+    hashable values and every cell to be within the grid's bounds. Only the
+    grid's shape and configuration (`Grid._properties`, and its border) are
+    pickled with the handle: `attach` returns an instance of the original
+    class with empty caches, layers and change tracking, and without any
+    attributes a subclass adds, which the caller must set up again.
+    """
+
+    def __init__(self, grid: Grid):
+        store = grid._grid
+        if not isinstance(store, DenseStore):
+            dense = PackedDenseStore if grid._positions == 'packed' else DenseStore
+            store = dense.collect(grid.row_range, grid.col_range, store, grid._default)
+
+        self.rows = store.row_range
+        self.cols = store.col_range
+        self.store = store.__class__
+        self.typecode = store.typecode
+        self.palette = store._palette
+        self.count = len(store)
+        self.cls = grid.__class__
+        self.state = {p: getattr(grid, p) for p in Grid._properties}
+        self.border = None
+        if grid._border:
+            width = grid.row_range.start - min(map(grid.position_row, grid._border))
+            self.border = width, next(iter(grid._border.values()))
+
+        super().__init__(memoryview(store._codes).cast('B'))
+
+    def attach(self) -> Grid:
+        """Return a read-only grid whose cells live in the shared memory block"""
+        grid = self.cls.__new__(self.cls)
+        Grid.__init__(grid)
+        grid.__dict__.update(self.state)
+        grid._init()
+        codes = self.buffer().cast(self.typecode)
+        grid._grid = self.store(self.rows, self.cols, codes=codes, palette=self.palette, count=self.count)
+        if self.border:
+            grid._frame(*self.border)
+        grid._readonly = True
+        return grid
+
+
+def share(data: Grid | list[bytes | bytearray]) -> SharedHandle:
+    """Copy grid- or array-shaped parse results into shared memory"""
+    if isinstance(data, Grid):
+        return SharedGrid(data)
+    if isinstance(data, list) and all(isinstance(row, (bytes, bytearray)) for row in data):
+        return SharedRows(data)
+    raise ValueError(f'Cannot share {data.__class__.__name__}')